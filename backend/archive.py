@@ -0,0 +1,71 @@
+"""Cold storage for old chat history and swipes.
+
+Rows past their retention window are moved out of the hot collections
+(``messages``, ``likes``, ``passes``) into ``<name>_archive`` collections so
+the hot indexes and working set stay small. Archive collections are created
+with a stronger block compressor (ARCHIVE_COMPRESSOR, zstd by default) since
+they are written once and read rarely.
+
+A move copies a batch into the archive and then deletes it from the source.
+Documents keep their ``_id``, so a batch interrupted between the two steps is
+simply copied again (the duplicates are ignored) and deleted on the next run.
+"""
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, List, Optional
+
+from pymongo.errors import BulkWriteError, CollectionInvalid
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COMPRESSOR = os.environ.get('ARCHIVE_COMPRESSOR', 'zstd')
+DUPLICATE_KEY = 11000
+
+
+def archive_name(collection: str) -> str:
+    return f"{collection}_archive"
+
+
+async def ensure_archive_collection(db, collection: str):
+    """Create the archive for a collection with the archive compressor."""
+    try:
+        await db.create_collection(
+            archive_name(collection),
+            storageEngine={'wiredTiger': {'configString': f'block_compressor={ARCHIVE_COMPRESSOR}'}}
+        )
+    except CollectionInvalid:
+        pass
+
+
+async def move_to_archive(db, collection: str, query: dict, batch_size: int, max_batches: int,
+                          on_batch: Optional[Callable[[List[dict]], Awaitable[None]]] = None) -> int:
+    """Move up to batch_size * max_batches matching documents; returns how many moved.
+
+    on_batch sees each batch once it is in the archive and before it leaves
+    the source, so it must be safe to repeat.
+    """
+    source, target = db[collection], db[archive_name(collection)]
+    moved = 0
+    for _ in range(max_batches):
+        docs = await source.find(query).sort('_id', 1).limit(batch_size).to_list(batch_size)
+        if not docs:
+            break
+        archived_at = datetime.now(timezone.utc).isoformat()
+        for doc in docs:
+            doc['archived_at'] = archived_at
+        try:
+            await target.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            # Left behind by an interrupted move; anything else is a real failure
+            if any(error['code'] != DUPLICATE_KEY for error in e.details['writeErrors']):
+                raise
+        if on_batch is not None:
+            await on_batch(docs)
+        await source.delete_many({'_id': {'$in': [doc['_id'] for doc in docs]}})
+        moved += len(docs)
+        if len(docs) < batch_size:
+            break
+    if moved:
+        logger.info(f"Archived {moved} documents from {collection}")
+    return moved
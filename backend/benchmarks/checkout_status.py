@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Checkout status polling benchmark against the local Stripe stand-in.
+
+Simulates many clients polling the same pending session and reports how
+many upstream Stripe calls the shared gateway made and the poll latency.
+
+    cd backend && python benchmarks/checkout_status.py [--clients 50 --rounds 10]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from stripe_standin import serve
+
+
+async def run(clients: int, rounds: int, interval: float):
+    import server  # payments is mounted by server.create_app, load it the same way
+    import payments
+
+    session = await payments.stripe_gateway.client("http://bench/api/webhook/stripe").create_checkout_session(
+        payments.stripe_checkout_module().CheckoutSessionRequest(
+            amount=payments.PRO_MONTHLY_PRICE,
+            currency="usd",
+            success_url="http://bench/success",
+            cancel_url="http://bench/cancel",
+            metadata={'product': 'pro_monthly'}
+        )
+    )
+
+    latencies = []
+
+    async def poll():
+        started = time.perf_counter()
+        await payments.stripe_gateway.checkout_status(session.session_id)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    for _ in range(rounds):
+        await asyncio.gather(*[poll() for _ in range(clients)])
+        await asyncio.sleep(interval)
+
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--interval', type=float, default=0.5)
+    parser.add_argument('--latency-ms', type=float, default=80.0)
+    args = parser.parse_args()
+
+    httpd, standin = serve(pay_after=10_000, latency_ms=args.latency_ms)
+    os.environ['STRIPE_API_BASE'] = f"http://127.0.0.1:{httpd.server_port}"
+    os.environ.setdefault('STRIPE_API_KEY', 'sk_test_standin')
+
+    latencies = asyncio.run(run(args.clients, args.rounds, args.interval))
+    polls = args.clients * args.rounds
+    print(f"polls: {polls}  upstream retrievals: {standin.stats['retrieve']}")
+    print(f"poll latency p50 {statistics.median(latencies):.1f} ms  "
+          f"p95 {statistics.quantiles(latencies, n=20)[-1]:.1f} ms")
+    httpd.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Discovery ranking benchmark on synthetic candidates.
+
+Scores N candidates the way get_discovery_profiles does (feature lists in,
+ranked indices out) and reports per-request latency against a budget.
+
+    cd backend && python benchmarks/discovery_ranking.py [--candidates 5000 --budget-ms 10]
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ranking import HOSTING_SCORES, score_candidates, top_n, weights_from_env
+
+INTERESTS = list(range(1, 301))  # interned tag ids
+
+
+def make_candidates(count: int, rng: random.Random, now: float) -> dict:
+    return {
+        'distances_km': [rng.uniform(0, 100) for _ in range(count)],
+        'candidate_interests': [rng.sample(INTERESTS, rng.randint(0, 12)) for _ in range(count)],
+        'last_active_ts': [None if rng.random() < 0.1 else now - rng.uniform(0, 14 * 86400) for _ in range(count)],
+        'available_now': [rng.random() < 0.2 for _ in range(count)],
+        'hosting': [rng.choice([None, *HOSTING_SCORES, 'Cannot Host']) for _ in range(count)],
+        'liked_me': [rng.random() < 0.05 for _ in range(count)],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--candidates', type=int, default=5000)
+    parser.add_argument('--top', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--budget-ms', type=float, default=10.0)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    now = time.time()
+    weights = weights_from_env()
+    my_interests = rng.sample(INTERESTS, 8)
+    candidates = make_candidates(args.candidates, rng, now)
+
+    latencies = []
+    for _ in range(args.requests):
+        started = time.perf_counter()
+        scores = score_candidates(
+            distance_limit=100,
+            my_interests=my_interests,
+            now_ts=now,
+            weights=weights,
+            **candidates
+        )
+        top_n(scores, args.top)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    p50 = statistics.median(latencies)
+    p95 = statistics.quantiles(latencies, n=20)[-1]
+    p99 = statistics.quantiles(latencies, n=100)[-1]
+    print(f"candidates: {args.candidates}  top: {args.top}  requests: {args.requests}")
+    print(f"ranking latency p50 {p50:.2f} ms  p95 {p95:.2f} ms  p99 {p99:.2f} ms")
+    print(f"budget {args.budget_ms:.1f} ms: {'ok' if p95 <= args.budget_ms else 'over budget'}")
+
+
+if __name__ == '__main__':
+    main()
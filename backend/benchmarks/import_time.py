@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Cold-start import benchmark for the API server.
+
+Each sample runs in a fresh interpreter so nothing is cached in
+sys.modules. Compares importing the app as it is now (payments loaded on
+first use) against also importing the Stripe checkout integration, which
+is what every worker paid at import time before it was made lazy.
+
+    cd backend && python benchmarks/import_time.py [--runs 15]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+SNIPPET = """
+import time
+started = time.perf_counter()
+{imports}
+print((time.perf_counter() - started) * 1000)
+"""
+
+SCENARIOS = {
+    'server (payments lazy)': 'import server',
+    'server + stripe checkout (eager)': 'import server\nimport emergentintegrations.payments.stripe.checkout',
+}
+
+
+def sample(imports: str) -> float:
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [str(BACKEND_DIR), os.environ.get('PYTHONPATH')]))}
+    result = subprocess.run(
+        [sys.executable, '-c', SNIPPET.format(imports=imports)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=15)
+    args = parser.parse_args()
+
+    results = {}
+    for name, imports in SCENARIOS.items():
+        timings = [sample(imports) for _ in range(args.runs)]
+        results[name] = statistics.median(timings)
+        print(f"{name:<36} median {results[name]:8.1f} ms  min {min(timings):8.1f} ms")
+
+    lazy, eager = results.values()
+    print(f"\nCold-start saving per worker: {eager - lazy:.1f} ms ({(eager - lazy) / eager:.0%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Moderation matcher throughput on synthetic chat messages.
+
+Screens N messages against the term file plus synthetic terms with the
+Aho-Corasick automaton the moderation workers use, and with a per-term
+substring loop for comparison. Reports messages per second for one core.
+
+    cd backend && python benchmarks/moderation_throughput.py [--messages 20000 --terms 2000]
+"""
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from moderation import Automaton, load_terms, normalize_text
+
+WORDS = ('hey how are you doing tonight want to grab a drink later my place or yours '
+         'love the photos what are you into hiking music movies free this weekend').split()
+
+
+def make_messages(count: int, terms: list, rng: random.Random) -> list:
+    messages = []
+    for _ in range(count):
+        words = rng.choices(WORDS, k=rng.randint(3, 40))
+        if rng.random() < 0.02:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(terms))
+        messages.append(' '.join(words))
+    return messages
+
+
+def naive_find(terms: list, text: str) -> list:
+    padded = f" {normalize_text(text)} "
+    return [t for t in terms if f" {t} " in padded]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--terms', type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    terms = list(load_terms(Path(__file__).resolve().parent.parent / 'moderation_terms.txt'))
+    while len(terms) < args.terms:
+        terms.append(''.join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 12))))
+    messages = make_messages(args.messages, terms, rng)
+
+    started = time.perf_counter()
+    automaton = Automaton(terms)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    flagged = sum(1 for m in messages if automaton.find(m))
+    automaton_rate = len(messages) / (time.perf_counter() - started)
+
+    sample = messages[:max(1, len(messages) // 10)]
+    started = time.perf_counter()
+    naive_flagged = sum(1 for m in sample if naive_find(terms, m))
+    naive_rate = len(sample) / (time.perf_counter() - started)
+
+    print(f"messages: {len(messages)}  terms: {len(terms)}  automaton build {build_ms:.1f} ms")
+    print(f"aho-corasick: {automaton_rate:,.0f} msgs/s  flagged {flagged}")
+    print(f"per-term loop: {naive_rate:,.0f} msgs/s  flagged {naive_flagged} of {len(sample)} sampled")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Local stand-in for the Stripe Checkout API.
+
+Implements just enough of /v1/checkout/sessions for the checkout routes,
+tests and benchmarks to run without network access or a Stripe account.
+Point the app at it with STRIPE_API_BASE=http://127.0.0.1:<port>.
+
+Sessions start open/unpaid and flip to complete/paid after --pay-after
+retrievals. GET /_stats reports how many upstream calls were made, which is
+what the status-polling benchmark uses to show coalescing.
+
+    python benchmarks/stripe_standin.py --port 12111 --pay-after 5
+"""
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+SESSION_PATH = re.compile(r'^/v1/checkout/sessions/([\w-]+)$')
+
+
+class StripeStandIn:
+    def __init__(self, pay_after: int = 5, latency_ms: float = 0.0):
+        self.pay_after = pay_after
+        self.latency_ms = latency_ms
+        self.sessions = {}
+        self.retrievals = {}
+        self.stats = {'create': 0, 'retrieve': 0}
+        self.lock = threading.Lock()
+
+    def create_session(self, form: dict) -> dict:
+        session_id = f"cs_test_{uuid.uuid4().hex}"
+        metadata = {
+            key[len('metadata['):-1]: value
+            for key, value in form.items() if key.startswith('metadata[')
+        }
+        amount = form.get('line_items[0][price_data][unit_amount]') or form.get('amount') or '0'
+        session = {
+            'id': session_id,
+            'object': 'checkout.session',
+            'url': f"https://checkout.stripe.test/pay/{session_id}",
+            'status': 'open',
+            'payment_status': 'unpaid',
+            'amount_total': int(float(amount)),
+            'currency': form.get('line_items[0][price_data][currency]', form.get('currency', 'usd')),
+            'metadata': metadata,
+            'success_url': form.get('success_url'),
+            'cancel_url': form.get('cancel_url'),
+        }
+        with self.lock:
+            self.stats['create'] += 1
+            self.sessions[session_id] = session
+            self.retrievals[session_id] = 0
+        return session
+
+    def retrieve_session(self, session_id: str):
+        with self.lock:
+            self.stats['retrieve'] += 1
+            session = self.sessions.get(session_id)
+            if session is None:
+                return None
+            self.retrievals[session_id] += 1
+            if self.retrievals[session_id] >= self.pay_after:
+                session['status'] = 'complete'
+                session['payment_status'] = 'paid'
+            return dict(session)
+
+    def handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, payload: dict):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _not_found(self):
+                self._send(404, {'error': {'type': 'invalid_request_error', 'message': 'No such resource'}})
+
+            def do_POST(self):
+                if standin.latency_ms:
+                    time.sleep(standin.latency_ms / 1000)
+                length = int(self.headers.get('Content-Length', 0))
+                form = dict(parse_qsl(self.rfile.read(length).decode()))
+                if self.path.split('?')[0] == '/v1/checkout/sessions':
+                    self._send(200, standin.create_session(form))
+                else:
+                    self._not_found()
+
+            def do_GET(self):
+                if standin.latency_ms:
+                    time.sleep(standin.latency_ms / 1000)
+                path = self.path.split('?')[0]
+                if path == '/_stats':
+                    self._send(200, standin.stats)
+                    return
+                match = SESSION_PATH.match(path)
+                session = standin.retrieve_session(match.group(1)) if match else None
+                if session is None:
+                    self._not_found()
+                else:
+                    self._send(200, session)
+
+        return Handler
+
+
+def serve(port: int = 0, pay_after: int = 5, latency_ms: float = 0.0):
+    """Start the stand-in on a background thread; returns (server, standin)."""
+    standin = StripeStandIn(pay_after=pay_after, latency_ms=latency_ms)
+    httpd = ThreadingHTTPServer(('127.0.0.1', port), standin.handler())
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, standin
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=12111)
+    parser.add_argument('--pay-after', type=int, default=5)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    args = parser.parse_args()
+
+    httpd, _ = serve(args.port, args.pay_after, args.latency_ms)
+    print(f"Stripe stand-in listening on http://127.0.0.1:{httpd.server_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        httpd.shutdown()
+
+
+if __name__ == '__main__':
+    main()
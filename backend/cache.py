@@ -0,0 +1,276 @@
+"""Shared cache and pub/sub backends.
+
+Every worker talks to the cache through the same small interface so caches
+stay coherent when the app runs under several uvicorn workers:
+
+- ``memory://`` keeps everything in process. Fine for a single worker and
+  for local development.
+- ``redis://host:port/db`` shares state through Redis (or any RESP
+  compatible stand-in such as a local ``redis-server``). Requires the
+  ``redis`` package, which is only imported when this backend is selected.
+
+Values must be JSON serializable. ``invalidate`` deletes keys and broadcasts
+them on a channel so workers can also drop any near-cache copies they keep
+via ``on_invalidate`` listeners. ``take_token`` is an atomic token bucket
+(used by the rate limiter).
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = 'cache:invalidate'
+
+MessageHandler = Callable[[Any], Awaitable[None]]
+InvalidationListener = Callable[[List[str]], None]
+
+
+class CacheBackend:
+    """Interface shared by the cache backends."""
+
+    def __init__(self, namespace: str = 'sparkmate'):
+        self.namespace = namespace
+        self._invalidation_listeners: List[InvalidationListener] = []
+
+    def key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def start(self):
+        await self.subscribe(INVALIDATION_CHANNEL, self._dispatch_invalidation)
+
+    async def close(self):
+        pass
+
+    async def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    async def delete(self, *keys: str):
+        raise NotImplementedError
+
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        raise NotImplementedError
+
+    async def take_token(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> Tuple[bool, float]:
+        """Take `cost` tokens from a bucket refilled at `rate` per second.
+
+        Returns (allowed, seconds until enough tokens are available).
+        """
+        raise NotImplementedError
+
+    async def publish(self, channel: str, message: Any):
+        raise NotImplementedError
+
+    async def subscribe(self, channel: str, handler: MessageHandler):
+        raise NotImplementedError
+
+    async def invalidate(self, *keys: str):
+        """Delete keys everywhere and tell every worker about it."""
+        if not keys:
+            return
+        await self.delete(*keys)
+        await self.publish(INVALIDATION_CHANNEL, list(keys))
+
+    def on_invalidate(self, listener: InvalidationListener):
+        self._invalidation_listeners.append(listener)
+
+    async def _dispatch_invalidation(self, keys: List[str]):
+        for listener in self._invalidation_listeners:
+            try:
+                listener(keys)
+            except Exception as e:
+                logger.error(f"Cache invalidation listener failed: {e}")
+
+
+class MemoryCache(CacheBackend):
+    """Process-local backend: a dict with expiry times and in-process channels."""
+
+    def __init__(self, namespace: str = 'sparkmate', max_entries: int = 100_000):
+        super().__init__(namespace)
+        self.max_entries = max_entries
+        self._data: Dict[str, tuple] = {}
+        self._subscribers: Dict[str, List[MessageHandler]] = {}
+
+    def _expired(self, expires_at: Optional[float]) -> bool:
+        return expires_at is not None and expires_at <= time.monotonic()
+
+    def _evict(self):
+        # Drop expired entries first, then the oldest insertions
+        for key in [k for k, (_, exp) in self._data.items() if self._expired(exp)]:
+            del self._data[key]
+        while len(self._data) >= self.max_entries:
+            del self._data[next(iter(self._data))]
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(self.key(key))
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if self._expired(expires_at):
+            del self._data[self.key(key)]
+            return None
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        if len(self._data) >= self.max_entries:
+            self._evict()
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._data[self.key(key)] = (value, expires_at)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._data.pop(self.key(key), None)
+
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        current = await self.get(key) or 0
+        entry = self._data.get(self.key(key))
+        value = current + amount
+        if entry is not None and not self._expired(entry[1]):
+            self._data[self.key(key)] = (value, entry[1])
+        else:
+            await self.set(key, value, ttl)
+        return value
+
+    async def take_token(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> Tuple[bool, float]:
+        now = time.monotonic()
+        state = await self.get(key)
+        tokens, updated = state if state is not None else (capacity, now)
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        # An untouched bucket is full again after capacity / rate seconds
+        await self.set(key, (tokens, now), ttl=capacity / rate)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+    async def publish(self, channel: str, message: Any):
+        for handler in list(self._subscribers.get(channel, [])):
+            try:
+                await handler(message)
+            except Exception as e:
+                logger.error(f"Subscriber for {channel} failed: {e}")
+
+    async def subscribe(self, channel: str, handler: MessageHandler):
+        self._subscribers.setdefault(channel, []).append(handler)
+
+
+# Token bucket state lives in a hash; Redis' clock keeps workers consistent
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return {allowed, tostring(retry_after)}
+"""
+
+
+class RedisCache(CacheBackend):
+    """Networked backend shared by every worker pointing at the same server."""
+
+    def __init__(self, url: str, namespace: str = 'sparkmate'):
+        super().__init__(namespace)
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("CACHE_URL points at Redis but the 'redis' package is not installed")
+        self._redis = redis.from_url(url)
+        self._pubsub = self._redis.pubsub()
+        self._handlers: Dict[str, List[MessageHandler]] = {}
+        self._listener: Optional[asyncio.Task] = None
+        self._token_bucket = self._redis.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def start(self):
+        await super().start()
+        self._listener = asyncio.create_task(self._listen())
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+        await self._pubsub.aclose()
+        await self._redis.aclose()
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self._redis.get(self.key(key))
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        px = int(ttl * 1000) if ttl else None
+        await self._redis.set(self.key(key), json.dumps(value), px=px)
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self._redis.delete(*[self.key(k) for k in keys])
+
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.incrby(self.key(key), amount)
+            if ttl:
+                pipe.pexpire(self.key(key), int(ttl * 1000), nx=True)
+            results = await pipe.execute()
+        return results[0]
+
+    async def take_token(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> Tuple[bool, float]:
+        allowed, retry_after = await self._token_bucket(keys=[self.key(key)], args=[rate, capacity, cost])
+        return bool(allowed), float(retry_after)
+
+    async def publish(self, channel: str, message: Any):
+        await self._redis.publish(self.key(channel), json.dumps(message))
+
+    async def subscribe(self, channel: str, handler: MessageHandler):
+        if channel not in self._handlers:
+            await self._pubsub.subscribe(self.key(channel))
+        self._handlers.setdefault(channel, []).append(handler)
+
+    async def _listen(self):
+        prefix = f"{self.namespace}:"
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is None:
+                    continue
+                channel = message['channel']
+                if isinstance(channel, bytes):
+                    channel = channel.decode()
+                payload = json.loads(message['data'])
+                for handler in list(self._handlers.get(channel[len(prefix):], [])):
+                    try:
+                        await handler(payload)
+                    except Exception as e:
+                        logger.error(f"Subscriber for {channel} failed: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Cache pub/sub listener error: {e}")
+                await asyncio.sleep(1)
+
+
+def create_cache(url: str, namespace: str = 'sparkmate') -> CacheBackend:
+    if url.startswith('memory://'):
+        return MemoryCache(namespace)
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisCache(url, namespace)
+    raise ValueError(f"Unsupported CACHE_URL: {url}")
@@ -0,0 +1,123 @@
+"""MongoDB client construction and connection pool monitoring.
+
+Pool sizing, timeouts and wire compression come from environment variables
+so they can be tuned per deployment without code changes:
+
+    MONGO_MAX_POOL_SIZE                 (default 100)
+    MONGO_MIN_POOL_SIZE                 (default 10)
+    MONGO_MAX_IDLE_TIME_MS              (default 300000)
+    MONGO_WAIT_QUEUE_TIMEOUT_MS         (default 5000)
+    MONGO_CONNECT_TIMEOUT_MS            (default 10000)
+    MONGO_SERVER_SELECTION_TIMEOUT_MS   (default 10000)
+    MONGO_SOCKET_TIMEOUT_MS             (default 30000)
+    MONGO_COMPRESSORS                   (e.g. "zstd,snappy,zlib"; off by default)
+"""
+import asyncio
+import os
+import threading
+import time
+from typing import Dict
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Counts pool activity and measures how long checkouts wait.
+
+    Motor runs pymongo on executor threads, and a checkout starts and
+    finishes on the same thread, so the start time is kept thread-local.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.open_connections = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.checkouts = 0
+        self.failed_checkouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'open_connections': self.open_connections,
+                'in_use': self.in_use,
+                'max_in_use': self.max_in_use,
+                'checkouts': self.checkouts,
+                'failed_checkouts': self.failed_checkouts,
+                'avg_wait_ms': round(self.total_wait_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                'max_wait_ms': round(self.max_wait_ms, 3),
+            }
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        started = getattr(self._local, 'started', None)
+        waited = (time.perf_counter() - started) * 1000 if started is not None else 0.0
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+            self.total_wait_ms += waited
+            self.max_wait_ms = max(self.max_wait_ms, waited)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.failed_checkouts += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections = max(0, self.open_connections - 1)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+
+def pool_settings_from_env() -> dict:
+    settings = {
+        'maxPoolSize': int(os.environ.get('MONGO_MAX_POOL_SIZE', '100')),
+        'minPoolSize': int(os.environ.get('MONGO_MIN_POOL_SIZE', '10')),
+        'maxIdleTimeMS': int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '300000')),
+        'waitQueueTimeoutMS': int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '5000')),
+        'connectTimeoutMS': int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', '10000')),
+        'serverSelectionTimeoutMS': int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '10000')),
+        'socketTimeoutMS': int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', '30000')),
+    }
+    compressors = os.environ.get('MONGO_COMPRESSORS')
+    if compressors:
+        settings['compressors'] = compressors
+    return settings
+
+
+def create_mongo_client(mongo_url: str, pool_stats: PoolStats) -> AsyncIOMotorClient:
+    return AsyncIOMotorClient(mongo_url, event_listeners=[pool_stats], **pool_settings_from_env())
+
+
+async def warm_pool(client: AsyncIOMotorClient, connections: int):
+    """Open the minimum pool up front so the first requests don't pay for it."""
+    if connections > 0:
+        await asyncio.gather(*[client.admin.command('ping') for _ in range(connections)])
@@ -0,0 +1,199 @@
+"""Account deletion cascade.
+
+Deleting an account is two-phase. The request handler only blocks the
+account and records a job in ``account_deletions``; the cascade that
+clears the user's data across the other collections runs later from the
+``process_account_deletions`` maintenance job.
+
+The cascade is an ordered list of steps, each a query over one collection
+that either deletes the matching documents or anonymizes them with an
+update that makes them stop matching. Steps work in batches of
+DELETION_BATCH_SIZE ids with a short pause between batches, so a large
+account never holds the event loop or floods the primary. Progress is
+written to the job after every batch and finished steps are skipped, so a
+run that stops halfway (time budget, restart, lost lease) picks up where
+it left off.
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+DELETION_BATCH_SIZE = int(os.environ.get('DELETION_BATCH_SIZE', '500'))
+DELETION_BATCH_PAUSE = float(os.environ.get('DELETION_BATCH_PAUSE_MS', '50')) / 1000
+DELETION_RUN_SECONDS = 30
+
+
+class Step:
+    def __init__(self, name: str, collection: str, query: Callable[[str], dict] = None,
+                 update: Union[dict, Callable[[str], dict], None] = None,
+                 resolve: Callable[[object, str], Awaitable[dict]] = None):
+        self.name = name
+        self.collection = collection
+        self.query = query
+        self.update = update
+        self.resolve = resolve
+
+    async def filter(self, db, user_id: str) -> dict:
+        if self.resolve is not None:
+            return await self.resolve(db, user_id)
+        return self.query(user_id)
+
+    def update_for(self, user_id: str) -> Optional[dict]:
+        return self.update(user_id) if callable(self.update) else self.update
+
+
+def either(*fields: str) -> Callable[[str], dict]:
+    return lambda user_id: {'$or': [{field: user_id} for field in fields]}
+
+
+def owned_by(field: str) -> Callable[[str], dict]:
+    return lambda user_id: {field: user_id}
+
+
+async def my_match_messages(db, user_id: str) -> dict:
+    matches = await db.matches.find(
+        {'$or': [{'user1_id': user_id}, {'user2_id': user_id}]},
+        {'_id': 0, 'id': 1}
+    ).to_list(None)
+    return {'match_id': {'$in': [m['id'] for m in matches]}}
+
+
+# Order matters: messages are found through matches, and the user and
+# profile documents go last so an interrupted cascade can still be resumed
+CASCADE: List[Step] = [
+    Step('likes', 'likes', either('user_id', 'target_user_id')),
+    Step('passes', 'passes', either('user_id', 'target_user_id')),
+    Step('likes_archive', 'likes_archive', either('user_id', 'target_user_id')),
+    Step('passes_archive', 'passes_archive', either('user_id', 'target_user_id')),
+    Step('swipe_history', 'swipe_history', owned_by('user_id')),
+    # Other users' archived swipes on the user
+    Step('swipe_history_targets', 'swipe_history', either('liked', 'passed'),
+         update=lambda user_id: {'$pull': {'liked': user_id, 'passed': user_id}}),
+    Step('winks', 'winks', either('sender_id', 'receiver_id')),
+    Step('profile_views', 'profile_views', either('viewer_id', 'viewed_id')),
+    Step('screenshot_attempts', 'screenshot_attempts', either('viewer_id', 'owner_id')),
+    Step('private_album_requests', 'private_album_requests', either('requester_id', 'owner_id')),
+    Step('private_album_access', 'private_album_access', either('requester_id', 'owner_id')),
+    Step('blocked_users', 'blocked_users', either('blocker_id', 'blocked_id')),
+    Step('messages', 'messages', resolve=my_match_messages),
+    Step('messages_archive', 'messages_archive', resolve=my_match_messages),
+    Step('matches', 'matches', either('user1_id', 'user2_id')),
+    Step('public_messages', 'public_messages', owned_by('sender_id')),
+    Step('uploaded_photos', 'uploaded_photos', owned_by('user_id')),
+    Step('photo_renditions', 'photo_renditions', owned_by('user_id')),
+    # Reports about the user are kept for safety review; reports they filed
+    # are kept without the reporter
+    Step('user_reports', 'user_reports', owned_by('reporter_id'),
+         update={'$set': {'reporter_id': None, 'reporter_deleted': True}}),
+    Step('profiles', 'profiles', owned_by('user_id')),
+    Step('users', 'users', owned_by('id')),
+]
+
+
+class AccountDeletions:
+    def __init__(self, get_db, steps: List[Step] = CASCADE, batch_size: int = DELETION_BATCH_SIZE,
+                 pause: float = DELETION_BATCH_PAUSE, run_seconds: float = DELETION_RUN_SECONDS):
+        self._get_db = get_db
+        self.steps = steps
+        self.batch_size = batch_size
+        self.pause = pause
+        self.run_seconds = run_seconds
+
+    @property
+    def db(self):
+        return self._get_db()
+
+    async def request(self, user_id: str) -> dict:
+        """Queue the cascade for a user (once; repeated requests return the same job)."""
+        job = {
+            'id': str(uuid.uuid4()),
+            'status': 'queued',
+            'requested_at': datetime.now(timezone.utc).isoformat(),
+            'completed_steps': [],
+            'current_step': None,
+            'progress': {},
+            'total_steps': len(self.steps),
+        }
+        try:
+            return await self.db.account_deletions.find_one_and_update(
+                {'user_id': user_id},
+                {'$setOnInsert': job},
+                projection={'_id': 0},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # A concurrent request inserted the job first
+            return await self.db.account_deletions.find_one({'user_id': user_id}, {'_id': 0})
+
+    async def run(self) -> Dict[str, int]:
+        """Work through queued deletions until done or out of time for this run."""
+        deadline = time.monotonic() + self.run_seconds
+        completed = removed = 0
+        while time.monotonic() < deadline:
+            job = await self.db.account_deletions.find_one(
+                {'status': {'$in': ['queued', 'running']}},
+                {'_id': 0}
+            )
+            if not job:
+                break
+            job_removed, finished = await self._run_job(job, deadline)
+            removed += job_removed
+            completed += finished
+        return {'completed': completed, 'removed': removed}
+
+    async def _run_job(self, job: dict, deadline: float) -> Tuple[int, bool]:
+        jobs = self.db.account_deletions
+        await jobs.update_one({'id': job['id']}, {'$set': {'status': 'running'}})
+        removed = 0
+        for step in self.steps:
+            if step.name in job['completed_steps']:
+                continue
+            await jobs.update_one({'id': job['id']}, {'$set': {'current_step': step.name}})
+            query = await step.filter(self.db, job['user_id'])
+            collection = self.db[step.collection]
+            while True:
+                if time.monotonic() >= deadline:
+                    return removed, False
+                docs = await collection.find(query, {'_id': 1}).limit(self.batch_size).to_list(self.batch_size)
+                if not docs:
+                    break
+                batch = {'_id': {'$in': [doc['_id'] for doc in docs]}}
+                if step.update is not None:
+                    await collection.update_many(batch, step.update_for(job['user_id']))
+                else:
+                    await collection.delete_many(batch)
+                removed += len(docs)
+                await jobs.update_one({'id': job['id']}, {'$inc': {f'progress.{step.name}': len(docs)}})
+                await asyncio.sleep(self.pause)
+            await jobs.update_one(
+                {'id': job['id']},
+                {'$addToSet': {'completed_steps': step.name}}
+            )
+        await jobs.update_one(
+            {'id': job['id']},
+            {'$set': {'status': 'completed', 'current_step': None,
+                      'completed_at': datetime.now(timezone.utc).isoformat()}}
+        )
+        logger.info(f"Account deletion {job['id']} completed, {sum(job['progress'].values()) + removed} documents")
+        return removed, True
+
+    async def status(self, deletion_id: str) -> Optional[dict]:
+        # The caller cannot be authenticated once the account is gone, so this
+        # is progress only: step names and counts, nothing about the user
+        job = await self.db.account_deletions.find_one(
+            {'id': deletion_id},
+            {'_id': 0, 'status': 1, 'completed_steps': 1, 'current_step': 1, 'total_steps': 1}
+        )
+        if job:
+            job['steps_done'] = len(job.get('completed_steps', []))
+        return job
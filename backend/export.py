@@ -0,0 +1,206 @@
+"""Personal data export.
+
+An export is a stream of sections (account, profile, matches, ...). Every
+section is an async generator over Mongo cursors with a fixed batch size,
+so memory stays bounded by one batch plus one output chunk regardless of
+how much history an account has. Reads go to a secondary when one is
+available and pause briefly between batches, keeping exports away from
+interactive traffic on the primary.
+
+Two formats:
+
+- ndjson: one ``{"section": ..., "data": ...}`` line per document and a
+  ``{"section": ..., "complete": true, "count": n}`` line when a section
+  ends (with a ``note`` for sections in SECTION_NOTES). Photos carry their
+  bytes base64 encoded.
+- zip: ``<section>.ndjson`` per section, photos as files under
+  ``photos/`` and a ``manifest.json`` with the counts and notes, written
+  with zipfile in streaming mode (no seeking, sizes in data descriptors).
+
+Messages are the ones the user sent; what others wrote to them is the
+other person's data and is left out, which the notes say.
+
+Sections are independent, so an interrupted download is resumed by asking
+again for just the sections that did not complete.
+"""
+import asyncio
+import base64
+import io
+import json
+import os
+import zipfile
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, Dict, List
+
+from pymongo import ReadPreference
+
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '200'))
+EXPORT_BATCH_PAUSE = float(os.environ.get('EXPORT_BATCH_PAUSE_MS', '20')) / 1000
+EXPORT_CHUNK_BYTES = 64 * 1024
+FORMATS = {'ndjson': 'application/x-ndjson', 'zip': 'application/zip'}
+
+
+def _read(db, name: str):
+    return db.get_collection(name, read_preference=ReadPreference.SECONDARY_PREFERRED)
+
+
+async def _documents(db, name: str, query: dict, projection: dict = None) -> AsyncIterator[dict]:
+    cursor = _read(db, name).find(query, {'_id': 0, **(projection or {})}).batch_size(EXPORT_BATCH_SIZE)
+    count = 0
+    async for doc in cursor:
+        yield doc
+        count += 1
+        if count % EXPORT_BATCH_SIZE == 0:
+            await asyncio.sleep(EXPORT_BATCH_PAUSE)
+
+
+async def _match_ids(db, user_id: str) -> List[str]:
+    matches = await _read(db, 'matches').find(
+        {'$or': [{'user1_id': user_id}, {'user2_id': user_id}]},
+        {'_id': 0, 'id': 1}
+    ).to_list(None)
+    return [m['id'] for m in matches]
+
+
+async def account_section(db, user_id):
+    async for doc in _documents(db, 'users', {'id': user_id}, {'password': 0}):
+        yield doc
+
+
+async def profile_section(db, user_id):
+    async for doc in _documents(db, 'profiles', {'user_id': user_id}, {'photo_renditions': 0}):
+        yield doc
+
+
+async def matches_section(db, user_id):
+    query = {'$or': [{'user1_id': user_id}, {'user2_id': user_id}]}
+    async for doc in _documents(db, 'matches', query, {'read_state': 0, 'last_message': 0}):
+        yield doc
+
+
+async def messages_section(db, user_id):
+    # Messages the user sent, hot and archived, found through their matches
+    query = {'match_id': {'$in': await _match_ids(db, user_id)}, 'sender_id': user_id}
+    for name in ('messages_archive', 'messages'):
+        async for doc in _documents(db, name, query, {'archived_at': 0, 'moderation': 0}):
+            yield doc
+
+
+async def likes_section(db, user_id):
+    for name in ('likes_archive', 'likes'):
+        async for doc in _documents(db, name, {'user_id': user_id}, {'archived_at': 0}):
+            yield doc
+
+
+async def uploaded_photos_section(db, user_id):
+    async for doc in _documents(db, 'uploaded_photos', {'user_id': user_id}):
+        yield doc
+
+
+async def photos_section(db, user_id):
+    # Full-size rendition bytes of every photo stored for the user
+    projection = {'id': 1, 'created_at': 1, 'renditions.full': 1}
+    async for doc in _documents(db, 'photo_renditions', {'user_id': user_id}, projection):
+        full = doc.get('renditions', {}).get('full')
+        if full:
+            yield {
+                'id': doc['id'],
+                'created_at': doc.get('created_at'),
+                'content_type': full['content_type'],
+                'data': bytes(full['data'])
+            }
+
+
+# Scope of sections that hold less than "everything about the user"
+SECTION_NOTES = {
+    'messages': "Messages you sent. Messages other people sent you are their personal data and are not included.",
+}
+
+SECTIONS: Dict[str, Callable] = {
+    'account': account_section,
+    'profile': profile_section,
+    'matches': matches_section,
+    'messages': messages_section,
+    'likes': likes_section,
+    'uploaded_photos': uploaded_photos_section,
+    'photos': photos_section,
+}
+
+
+def _line(record: dict) -> bytes:
+    return (json.dumps(record, default=str, separators=(',', ':')) + '\n').encode()
+
+
+def _photo_record(photo: dict) -> dict:
+    return {**photo, 'data': base64.b64encode(photo['data']).decode()}
+
+
+async def stream_ndjson(db, user_id: str, sections: List[str]) -> AsyncIterator[bytes]:
+    buffer = bytearray()
+    for name in sections:
+        count = 0
+        async for doc in SECTIONS[name](db, user_id):
+            buffer += _line({'section': name, 'data': _photo_record(doc) if name == 'photos' else doc})
+            count += 1
+            if len(buffer) >= EXPORT_CHUNK_BYTES:
+                yield bytes(buffer)
+                buffer.clear()
+        complete = {'section': name, 'complete': True, 'count': count}
+        if name in SECTION_NOTES:
+            complete['note'] = SECTION_NOTES[name]
+        buffer += _line(complete)
+    if buffer:
+        yield bytes(buffer)
+
+
+class _ZipSink(io.RawIOBase):
+    """Write-only, non-seekable target; the stream drains it between writes."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.buffer += data
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+async def stream_zip(db, user_id: str, sections: List[str]) -> AsyncIterator[bytes]:
+    sink = _ZipSink()
+    archive = zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED)
+    counts = {}
+    for name in sections:
+        count = 0
+        if name == 'photos':
+            async for photo in SECTIONS[name](db, user_id):
+                extension = photo['content_type'].split('/')[-1]
+                info = zipfile.ZipInfo(f"photos/{photo['id']}.{extension}")
+                # Already compressed image data
+                info.compress_type = zipfile.ZIP_STORED
+                archive.writestr(info, photo['data'])
+                count += 1
+                yield sink.drain()
+        else:
+            with archive.open(f'{name}.ndjson', 'w', force_zip64=True) as entry:
+                async for doc in SECTIONS[name](db, user_id):
+                    entry.write(_line(doc))
+                    count += 1
+                    if len(sink.buffer) >= EXPORT_CHUNK_BYTES:
+                        yield sink.drain()
+        counts[name] = count
+    manifest = {
+        'exported_at': datetime.now(timezone.utc).isoformat(),
+        'user_id': user_id,
+        'sections': counts,
+        'notes': {name: note for name, note in SECTION_NOTES.items() if name in counts}
+    }
+    archive.writestr('manifest.json', json.dumps(manifest, indent=2))
+    archive.close()
+    yield sink.drain()
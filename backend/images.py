@@ -0,0 +1,130 @@
+"""Photo decoding, validation and rendition pipeline.
+
+Clients upload photos as base64 data URIs straight from the camera. Each
+upload is decoded and validated, EXIF orientation is applied and then all
+metadata is dropped, and fixed-size renditions are encoded:
+
+    thumb  160px  avatars, lists
+    card   480px  discovery cards, chat bubbles
+    full  1280px  photo viewer
+
+All Pillow work happens in a process pool so the event loop never decodes
+or encodes an image. Pillow is imported where it is used, so importing
+this module (and the app) does not load it.
+"""
+import asyncio
+import base64
+import binascii
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+RENDITIONS = {'thumb': 160, 'card': 480, 'full': 1280}
+MAX_UPLOAD_BYTES = int(os.environ.get('IMAGE_MAX_UPLOAD_BYTES', str(15 * 1024 * 1024)))
+MAX_PIXELS = 50_000_000
+ALLOWED_SOURCE_FORMATS = {'JPEG', 'PNG', 'WEBP', 'HEIF', 'MPO'}
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', str(max(1, (os.cpu_count() or 2) // 2))))
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def is_data_uri(value: str) -> bool:
+    return isinstance(value, str) and value.startswith('data:image/')
+
+
+def check_upload_size(value: str):
+    if len(value) * 3 // 4 > MAX_UPLOAD_BYTES:
+        raise InvalidImage("Photo is too large")
+
+
+def decode_data_uri(value: str) -> bytes:
+    header, _, payload = value.partition(',')
+    if not header.endswith(';base64') or not payload:
+        raise InvalidImage("Photos must be base64 encoded data URIs")
+    check_upload_size(payload)
+    try:
+        return base64.b64decode(payload, validate=True)
+    except (binascii.Error, ValueError):
+        raise InvalidImage("Photo is not valid base64")
+
+
+def output_format() -> str:
+    from PIL import features
+    preferred = os.environ.get('IMAGE_FORMAT', 'WEBP').upper()
+    if preferred == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return preferred
+
+
+def render(data_uri: str, image_format: str) -> Dict[str, dict]:
+    """Decode, validate and encode every rendition. Runs in a worker process."""
+    from PIL import Image, ImageOps
+    Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+    data = decode_data_uri(data_uri)
+    try:
+        with Image.open(io.BytesIO(data)) as probe:
+            if probe.format not in ALLOWED_SOURCE_FORMATS:
+                raise InvalidImage(f"Unsupported image format: {probe.format}")
+            probe.verify()
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except InvalidImage:
+        raise
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        raise InvalidImage("Photo resolution is too large")
+    except Exception:
+        raise InvalidImage("Photo could not be decoded")
+
+    # Bake the camera orientation into the pixels; EXIF is not copied to
+    # the renditions, which strips GPS and device metadata
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    content_type = f"image/{image_format.lower()}"
+    renditions = {}
+    for name, max_edge in RENDITIONS.items():
+        resized = image.copy()
+        resized.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        buffer = io.BytesIO()
+        if image_format == 'WEBP':
+            resized.save(buffer, 'WEBP', quality=80, method=4)
+        else:
+            resized.save(buffer, 'JPEG', quality=82, optimize=True, progressive=True)
+        renditions[name] = {
+            'content_type': content_type,
+            'width': resized.width,
+            'height': resized.height,
+            'data': buffer.getvalue(),
+        }
+    return renditions
+
+
+class ImagePipeline:
+    """Owns the process pool; started and stopped with the app."""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+
+    async def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def process(self, data_uri: str) -> Dict[str, dict]:
+        check_upload_size(data_uri)
+        self.start()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, render, data_uri, output_format())
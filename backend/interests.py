@@ -0,0 +1,118 @@
+"""Interned interest tags.
+
+Interests are free-form strings on the profile. Each normalized string is
+interned once in ``interest_tags`` as a small integer id, and profiles carry
+the ids in ``interest_ids`` next to the display strings. The multikey index
+on ``profiles.interest_ids`` is the inverted index: one posting list of
+profiles per tag, which Mongo intersects for ``$all`` queries.
+
+The name <-> id dictionary is tiny and immutable once written, so every
+worker keeps it in memory and only goes to Mongo for names it has not seen.
+"""
+import asyncio
+import logging
+import re
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = 500
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_interest(interest: str) -> str:
+    return _WHITESPACE.sub(' ', interest).strip().lower()
+
+
+class InterestTags:
+    """Tag dictionary plus a one-shot backfill of ids for older profiles."""
+
+    def __init__(self, get_db):
+        self._get_db = get_db
+        self._ids: Dict[str, int] = {}
+        self._names: Dict[int, str] = {}
+        self._backfill: Optional[asyncio.Task] = None
+
+    @property
+    def db(self):
+        return self._get_db()
+
+    def _remember(self, tag_id: int, name: str):
+        self._ids[name] = tag_id
+        self._names[tag_id] = name
+
+    async def _allocate(self, name: str) -> int:
+        counter = await self.db.counters.find_one_and_update(
+            {'_id': 'interest_tags'},
+            {'$inc': {'seq': 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        try:
+            await self.db.interest_tags.insert_one({'id': counter['seq'], 'name': name})
+            return counter['seq']
+        except DuplicateKeyError:
+            # Another worker interned it first; the allocated id is skipped
+            existing = await self.db.interest_tags.find_one({'name': name}, {'_id': 0, 'id': 1})
+            return existing['id']
+
+    async def ids(self, interests: Iterable[str], create: bool = True) -> List[int]:
+        """Ids for the given interests in input order, without duplicates.
+
+        With create=False unknown names are left out instead of interned.
+        """
+        names = list(dict.fromkeys(n for n in (normalize_interest(i) for i in interests) if n))
+        missing = [n for n in names if n not in self._ids]
+        if missing:
+            known = await self.db.interest_tags.find(
+                {'name': {'$in': missing}},
+                {'_id': 0, 'id': 1, 'name': 1}
+            ).to_list(None)
+            for tag in known:
+                self._remember(tag['id'], tag['name'])
+            if create:
+                for name in missing:
+                    if name not in self._ids:
+                        self._remember(await self._allocate(name), name)
+        return [self._ids[n] for n in names if n in self._ids]
+
+    def start(self):
+        self._backfill = asyncio.create_task(self._run_backfill())
+
+    async def stop(self):
+        if self._backfill is not None:
+            self._backfill.cancel()
+            try:
+                await self._backfill
+            except asyncio.CancelledError:
+                pass
+            self._backfill = None
+
+    async def _run_backfill(self):
+        """Intern the interests of profiles written before tags existed."""
+        try:
+            while True:
+                profiles = await self.db.profiles.find(
+                    {'interest_ids': {'$exists': False}},
+                    {'_id': 0, 'user_id': 1, 'interests': 1}
+                ).limit(BACKFILL_BATCH_SIZE).to_list(BACKFILL_BATCH_SIZE)
+                if not profiles:
+                    return
+                operations = []
+                for profile in profiles:
+                    tag_ids = await self.ids(profile.get('interests') or [])
+                    operations.append(UpdateOne(
+                        {'user_id': profile['user_id'], 'interest_ids': {'$exists': False}},
+                        # Versioned like any other profile write, so cached copies revalidate
+                        {'$set': {'interest_ids': tag_ids}, '$inc': {'version': 1}}
+                    ))
+                await self.db.profiles.bulk_write(operations, ordered=False)
+                logger.info(f"Backfilled interest ids for {len(operations)} profiles")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Interest id backfill failed: {e}")
@@ -0,0 +1,282 @@
+"""Asynchronous content screening for chat and public messages.
+
+Messages are screened after they are stored, never on the send path:
+handlers call ``submit()``, which only enqueues. Consumer tasks drain the
+queue in batches and run each batch through an Aho-Corasick automaton in a
+process pool, so a message is matched against every term in one pass over
+its text whatever the size of the term list.
+
+Terms live in a text file (MODERATION_TERMS_FILE), one per line, with an
+optional action: ``term`` or ``term|flag`` flags the message for review,
+``term|hide`` also hides it from everyone but the sender. Lines starting
+with # are comments. ``reload()`` rebuilds the automaton from the file on
+every worker via the shared cache's pub/sub.
+
+Matching is case-insensitive, folds common character substitutions
+(``@`` -> ``a``, ``0`` -> ``o``, ...) and only counts whole-word matches.
+Word boundaries are judged on the original text, so punctuation that also
+folds (``!``, ``$``) still ends a word.
+"""
+import asyncio
+import logging
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+RELOAD_CHANNEL = 'moderation:reload'
+ACTIONS = ('flag', 'hide')
+
+_FOLD = str.maketrans({'@': 'a', '4': 'a', '3': 'e', '1': 'i', '!': 'i', '0': 'o', '$': 's', '5': 's', '7': 't'})
+
+
+def normalize_text(text: str) -> str:
+    return ' '.join(text.lower().translate(_FOLD).split())
+
+
+def _normalize_with_offsets(text: str) -> Tuple[str, List[int]]:
+    """normalize_text plus, for each normalized character, its index in text."""
+    chars, offsets = [], []
+    for index, char in enumerate(text):
+        if char.isspace():
+            if chars and chars[-1] != ' ':
+                chars.append(' ')
+                offsets.append(index)
+            continue
+        for folded in char.lower().translate(_FOLD):
+            chars.append(folded)
+            offsets.append(index)
+    if chars and chars[-1] == ' ':
+        chars.pop()
+        offsets.pop()
+    return ''.join(chars), offsets
+
+
+class Automaton:
+    """Aho-Corasick matcher over normalized terms."""
+
+    def __init__(self, terms: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[str]] = [[]]
+        for term in terms:
+            self._add(normalize_text(term))
+        self._build()
+
+    def _add(self, term: str):
+        if not term:
+            return
+        node = 0
+        for char in term:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(term)
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child].extend(self._out[self._fail[child]])
+
+    def find(self, text: str) -> List[str]:
+        """Distinct terms occurring in text as whole words."""
+        normalized, offsets = _normalize_with_offsets(text)
+        found = []
+        node = 0
+        for end, char in enumerate(normalized):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for term in self._out[node]:
+                first, last = offsets[end - len(term) + 1], offsets[end]
+                before = text[first - 1] if first > 0 else ' '
+                after = text[last + 1] if last + 1 < len(text) else ' '
+                if not before.isalnum() and not after.isalnum() and term not in found:
+                    found.append(term)
+        return found
+
+
+def load_terms(path: Path) -> Dict[str, str]:
+    """Normalized term -> action from the term file (missing file = no terms)."""
+    terms = {}
+    if not path.exists():
+        return terms
+    for line in path.read_text(encoding='utf-8').splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        term, _, action = line.partition('|')
+        action = action.strip().lower() or 'flag'
+        if action not in ACTIONS:
+            logger.warning(f"Unknown moderation action {action!r} for {term!r}, flagging instead")
+            action = 'flag'
+        term = normalize_text(term)
+        if term and terms.get(term) != 'hide':
+            terms[term] = action
+    return terms
+
+
+# Worker process state: one automaton per process, built by the initializer
+_automaton: Optional[Automaton] = None
+
+
+def _init_worker(terms: List[str]):
+    global _automaton
+    _automaton = Automaton(terms)
+
+
+def screen_batch(batch: List[Tuple[int, str]]) -> Tuple[List[Tuple[int, List[str]]], float]:
+    """Runs in a worker process; returns matches and the CPU time spent."""
+    started = time.perf_counter()
+    results = [(key, _automaton.find(text)) for key, text in batch]
+    return [r for r in results if r[1]], time.perf_counter() - started
+
+
+ResultHandler = Callable[[List[Tuple[dict, List[str], str]]], Awaitable[None]]
+
+
+class ModerationEngine:
+    def __init__(self, terms_path: Path, workers: int, batch_size: int = 200,
+                 max_queue: int = 50_000, batch_wait: float = 0.05):
+        self.terms_path = terms_path
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.terms: Dict[str, str] = {}
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._tasks: List[asyncio.Task] = []
+        self._handler: Optional[ResultHandler] = None
+        self._cache = None
+        self.screened = 0
+        self.flagged = 0
+        self.hidden = 0
+        self.dropped = 0
+        self.batches = 0
+        self.busy_seconds = 0.0
+        self._recent: deque = deque(maxlen=50)
+
+    def configure(self, cache, handler: ResultHandler):
+        self._cache = cache
+        self._handler = handler
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(list(self.terms),)
+        )
+
+    def reload_local(self) -> int:
+        self.terms = load_terms(self.terms_path)
+        previous, self._executor = self._executor, self._new_executor()
+        if previous is not None:
+            # Batches already running on the old pool finish with the old terms
+            previous.shutdown(wait=False)
+        logger.info(f"Moderation terms loaded: {len(self.terms)}")
+        return len(self.terms)
+
+    async def reload(self):
+        """Reload the term file on every worker."""
+        await self._cache.publish(RELOAD_CHANNEL, {'at': time.time()})
+
+    async def _on_reload(self, message):
+        self.reload_local()
+
+    def start(self):
+        self.reload_local()
+        self._tasks = [asyncio.create_task(self._consume()) for _ in range(self.workers)]
+        if self._cache is not None:
+            self._tasks.append(asyncio.create_task(self._cache.subscribe(RELOAD_CHANNEL, self._on_reload)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, message: dict, text: str):
+        """Queue a stored message for screening; never blocks the caller."""
+        if not text or not self.terms:
+            return
+        try:
+            self._queue.put_nowait((message, text))
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def _next_batch(self) -> List[Tuple[dict, str]]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            try:
+                matches, busy = await loop.run_in_executor(
+                    self._executor, screen_batch, [(i, text) for i, (_, text) in enumerate(batch)]
+                )
+                results = []
+                for index, found in matches:
+                    action = 'hide' if any(self.terms.get(t) == 'hide' for t in found) else 'flag'
+                    results.append((batch[index][0], found, action))
+                if results and self._handler is not None:
+                    await self._handler(results)
+                self.screened += len(batch)
+                self.flagged += len(results)
+                self.hidden += sum(1 for r in results if r[2] == 'hide')
+                self.batches += 1
+                self.busy_seconds += busy
+                self._recent.append((time.monotonic(), len(batch)))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Moderation batch of {len(batch)} failed: {e}")
+
+    def snapshot(self) -> dict:
+        recent_rate = 0.0
+        if len(self._recent) > 1:
+            span = self._recent[-1][0] - self._recent[0][0]
+            if span > 0:
+                recent_rate = sum(n for _, n in list(self._recent)[1:]) / span
+        return {
+            'terms': len(self.terms),
+            'queued': self._queue.qsize(),
+            'screened': self.screened,
+            'flagged': self.flagged,
+            'hidden': self.hidden,
+            'dropped': self.dropped,
+            'batches': self.batches,
+            'worker_msgs_per_sec': round(self.screened / self.busy_seconds, 1) if self.busy_seconds else None,
+            'recent_msgs_per_sec': round(recent_rate, 1),
+        }
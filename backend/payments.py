@@ -0,0 +1,325 @@
+"""Stripe checkout routes.
+
+Kept out of server.py so the payments integration is only imported when a
+checkout route is actually hit: the router itself is cheap to load, and
+``stripe_checkout_module`` pulls in emergentintegrations on first use.
+"""
+from fastapi import APIRouter, HTTPException, Depends, Header, Request
+from pydantic import BaseModel
+from functools import lru_cache
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+import asyncio
+import logging
+import os
+import uuid
+
+import server
+
+logger = logging.getLogger(__name__)
+
+# Stripe Config
+STRIPE_API_KEY = os.environ.get('STRIPE_API_KEY')
+PRO_MONTHLY_PRICE = float(os.environ.get('PRO_MONTHLY_PRICE', '19.99'))
+PROMO_FIRST_MONTH_PRICE = 9.99  # 50% off first month
+STRIPE_API_BASE = os.environ.get('STRIPE_API_BASE')  # point at a local stand-in for tests/benchmarks
+CHECKOUT_STATUS_CACHE_TTL = float(os.environ.get('CHECKOUT_STATUS_CACHE_TTL', '3'))
+WEBHOOK_BATCH_SIZE = int(os.environ.get('WEBHOOK_BATCH_SIZE', '100'))
+WEBHOOK_POLL_INTERVAL = float(os.environ.get('WEBHOOK_POLL_INTERVAL', '2'))
+WEBHOOK_CLAIM_TIMEOUT = 300  # seconds before a claimed batch from a dead worker is retried
+WEBHOOK_MAX_ATTEMPTS = int(os.environ.get('WEBHOOK_MAX_ATTEMPTS', '5'))
+
+FINAL_CHECKOUT_STATUSES = {'complete', 'expired'}
+FINAL_PAYMENT_STATUSES = {'paid', 'no_payment_required'}
+
+router = APIRouter(prefix="/api")
+
+class CheckoutRequest(BaseModel):
+    origin_url: str
+
+@lru_cache(maxsize=None)
+def stripe_checkout_module():
+    from emergentintegrations.payments.stripe import checkout
+    if STRIPE_API_BASE:
+        import stripe
+        stripe.api_base = STRIPE_API_BASE
+    return checkout
+
+class StripeGateway:
+    """Long-lived checkout clients and coalesced checkout status lookups.
+    
+    Clients are built once per webhook URL and reused so the underlying HTTP
+    connections stay warm. Status lookups for sessions that haven't settled
+    are cached in the shared cache for CHECKOUT_STATUS_CACHE_TTL seconds, and
+    concurrent polls for the same session in this worker share one upstream
+    call.
+    """
+    
+    MAX_CLIENTS = 16
+    
+    def __init__(self, status_ttl: float):
+        self.status_ttl = status_ttl
+        self._clients: Dict[str, object] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+    
+    def client(self, webhook_url: str = "placeholder"):
+        stripe_checkout = self._clients.get(webhook_url)
+        if stripe_checkout is None:
+            if len(self._clients) >= self.MAX_CLIENTS:
+                self._clients.pop(next(iter(self._clients)))
+            stripe_checkout = stripe_checkout_module().StripeCheckout(api_key=STRIPE_API_KEY, webhook_url=webhook_url)
+            self._clients[webhook_url] = stripe_checkout
+        return stripe_checkout
+    
+    async def checkout_status(self, session_id: str) -> dict:
+        cached = await server.cache.get(f"stripe:checkout_status:{session_id}")
+        if cached is not None:
+            return cached
+        
+        task = self._inflight.get(session_id)
+        if task is None:
+            task = asyncio.create_task(self._fetch_status(session_id))
+            self._inflight[session_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(session_id, None))
+        return await asyncio.shield(task)
+    
+    async def _fetch_status(self, session_id: str) -> dict:
+        status = (await self.client().get_checkout_status(session_id)).model_dump()
+        settled = status.get('status') in FINAL_CHECKOUT_STATUSES or status.get('payment_status') in FINAL_PAYMENT_STATUSES
+        if self.status_ttl > 0 and not settled:
+            await server.cache.set(f"stripe:checkout_status:{session_id}", status, ttl=self.status_ttl)
+        return status
+
+stripe_gateway = StripeGateway(CHECKOUT_STATUS_CACHE_TTL)
+
+@router.post("/subscription/checkout")
+async def create_checkout_session(checkout_req: CheckoutRequest, current_user = Depends(server.get_current_user)):
+    host_url = checkout_req.origin_url
+    webhook_url = f"{host_url}/api/webhook/stripe"
+    stripe_checkout = stripe_gateway.client(webhook_url)
+    
+    success_url = f"{host_url}/subscription/success?session_id={{{{CHECKOUT_SESSION_ID}}}}"
+    cancel_url = f"{host_url}/subscription/cancel"
+    
+    checkout_request = stripe_checkout_module().CheckoutSessionRequest(
+        amount=PRO_MONTHLY_PRICE,
+        currency="usd",
+        success_url=success_url,
+        cancel_url=cancel_url,
+        metadata={
+            'user_id': current_user['id'],
+            'product': 'pro_monthly'
+        }
+    )
+    
+    session = await stripe_checkout.create_checkout_session(checkout_request)
+    
+    await server.db.payment_transactions.insert_one({
+        'id': str(uuid.uuid4()),
+        'user_id': current_user['id'],
+        'session_id': session.session_id,
+        'amount': PRO_MONTHLY_PRICE,
+        'currency': 'usd',
+        'payment_status': 'pending',
+        'metadata': {'product': 'pro_monthly'},
+        'created_at': datetime.now(timezone.utc).isoformat()
+    })
+    
+    return {'url': session.url, 'session_id': session.session_id}
+
+async def grant_pro_entitlements(session_ids: List[str]):
+    """Mark paid sessions, upgrade their users and record subscriptions.
+    
+    Safe to call repeatedly for the same sessions: transactions already paid
+    are skipped and subscriptions are upserted on session_id.
+    """
+    transactions = await server.db.payment_transactions.find(
+        {'session_id': {'$in': session_ids}, 'payment_status': {'$ne': 'paid'}},
+        {'_id': 0, 'session_id': 1, 'user_id': 1}
+    ).to_list(None)
+    if not transactions:
+        return
+    
+    now = datetime.now(timezone.utc).isoformat()
+    await server.db.payment_transactions.update_many(
+        {'session_id': {'$in': [t['session_id'] for t in transactions]}, 'payment_status': {'$ne': 'paid'}},
+        {'$set': {'payment_status': 'paid', 'updated_at': now}}
+    )
+    await server.db.users.update_many(
+        {'id': {'$in': list({t['user_id'] for t in transactions})}},
+        {'$set': {'is_pro': True}}
+    )
+    await server.db.subscriptions.bulk_write([
+        UpdateOne(
+            {'session_id': t['session_id']},
+            {'$setOnInsert': {
+                'id': str(uuid.uuid4()),
+                'user_id': t['user_id'],
+                'session_id': t['session_id'],
+                'status': 'active',
+                'started_at': now
+            }},
+            upsert=True
+        )
+        for t in transactions
+    ], ordered=False)
+
+class WebhookProcessor:
+    """Applies recorded Stripe webhook events in batches, off the request path.
+    
+    Events are claimed from stripe_webhook_events with a per-batch token so
+    several workers can run this loop without applying the same event twice.
+    Batches left in 'processing' by a worker that died are requeued after
+    WEBHOOK_CLAIM_TIMEOUT seconds. A batch that fails to apply is retried on
+    the next poll, and its events are parked as 'failed' after
+    WEBHOOK_MAX_ATTEMPTS tries.
+    """
+    
+    def __init__(self, batch_size: int, poll_interval: float):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+    
+    def notify(self):
+        self._wakeup.set()
+    
+    async def process_pending(self):
+        stale_before = (datetime.now(timezone.utc) - timedelta(seconds=WEBHOOK_CLAIM_TIMEOUT)).isoformat()
+        await server.db.stripe_webhook_events.update_many(
+            {'status': 'processing', 'claimed_at': {'$lt': stale_before}},
+            {'$set': {'status': 'pending'}, '$unset': {'claimed_by': '', 'claimed_at': ''}}
+        )
+        while True:
+            token, events = await self._claim_batch()
+            if not events:
+                return
+            if not await self._apply(token, events):
+                # Leave the retry to the next poll instead of spinning on it
+                return
+    
+    async def _claim_batch(self):
+        pending = await server.db.stripe_webhook_events.find(
+            {'status': 'pending'}, {'_id': 0, 'event_id': 1}
+        ).sort('received_at', 1).limit(self.batch_size).to_list(self.batch_size)
+        if not pending:
+            return None, []
+        
+        token = str(uuid.uuid4())
+        await server.db.stripe_webhook_events.update_many(
+            {'event_id': {'$in': [e['event_id'] for e in pending]}, 'status': 'pending'},
+            {'$set': {
+                'status': 'processing',
+                'claimed_by': token,
+                'claimed_at': datetime.now(timezone.utc).isoformat()
+            }}
+        )
+        events = await server.db.stripe_webhook_events.find(
+            {'claimed_by': token, 'status': 'processing'}, {'_id': 0}
+        ).to_list(self.batch_size)
+        return token, events
+    
+    async def _apply(self, token: str, events: List[dict]) -> bool:
+        paid_sessions = list({e['session_id'] for e in events if e.get('payment_status') == 'paid' and e.get('session_id')})
+        try:
+            if paid_sessions:
+                await grant_pro_entitlements(paid_sessions)
+        except Exception as e:
+            logger.error(f"Applying {len(events)} webhook events failed, will retry: {e}")
+            await server.db.stripe_webhook_events.update_many(
+                {'claimed_by': token, 'attempts': {'$gte': WEBHOOK_MAX_ATTEMPTS - 1}},
+                {
+                    '$set': {'status': 'failed', 'last_error': str(e)},
+                    '$inc': {'attempts': 1},
+                    '$unset': {'claimed_by': '', 'claimed_at': ''}
+                }
+            )
+            await server.db.stripe_webhook_events.update_many(
+                {'claimed_by': token},
+                {
+                    '$set': {'status': 'pending', 'last_error': str(e)},
+                    '$inc': {'attempts': 1},
+                    '$unset': {'claimed_by': '', 'claimed_at': ''}
+                }
+            )
+            return False
+        await server.db.stripe_webhook_events.update_many(
+            {'claimed_by': token},
+            {'$set': {'status': 'processed', 'processed_at': datetime.now(timezone.utc).isoformat()}}
+        )
+        return True
+    
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.process_pending()
+            except Exception as e:
+                logger.error(f"Webhook processor error: {e}")
+    
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+webhook_processor = WebhookProcessor(WEBHOOK_BATCH_SIZE, WEBHOOK_POLL_INTERVAL)
+server.background_workers.append(webhook_processor)
+
+@router.get("/subscription/checkout/status/{session_id}")
+async def get_checkout_status(session_id: str, current_user = Depends(server.get_current_user)):
+    transaction = await server.db.payment_transactions.find_one({'session_id': session_id}, {'_id': 0})
+    if not transaction:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    
+    if transaction['payment_status'] == 'paid':
+        return {'status': 'complete', 'payment_status': 'paid'}
+    
+    status = await stripe_gateway.checkout_status(session_id)
+    
+    if status['payment_status'] == 'paid':
+        await grant_pro_entitlements([session_id])
+    
+    return status
+
+@router.post("/webhook/stripe")
+async def stripe_webhook(request: Request, stripe_signature: str = Header(None)):
+    body = await request.body()
+    
+    try:
+        webhook_response = await stripe_gateway.client().handle_webhook(body, stripe_signature)
+    except Exception as e:
+        logger.error(f"Webhook error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Record the event and acknowledge straight away; the unique index on
+    # event_id turns Stripe's redeliveries into no-ops
+    try:
+        await server.db.stripe_webhook_events.insert_one({
+            'event_id': webhook_response.event_id,
+            'event_type': webhook_response.event_type,
+            'session_id': webhook_response.session_id,
+            'payment_status': webhook_response.payment_status,
+            'metadata': webhook_response.metadata,
+            'status': 'pending',
+            'attempts': 0,
+            'received_at': datetime.now(timezone.utc).isoformat()
+        })
+    except DuplicateKeyError:
+        return {'status': 'duplicate'}
+    
+    webhook_processor.notify()
+    return {'status': 'success'}
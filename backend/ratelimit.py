@@ -0,0 +1,154 @@
+"""Token bucket rate limiting for the expensive endpoints.
+
+Rules are keyed by "METHOD /path/{param}" and give a bucket per client IP
+and/or per authenticated user as "<requests>/<seconds>", e.g. "10/60" is a
+burst of 10 refilled at 10 per minute. Defaults live in DEFAULT_RULES and
+can be replaced per route with the RATE_LIMIT_RULES environment variable
+(JSON in the same shape; a null rule disables limiting for that route).
+
+Buckets are kept in process (RATE_LIMIT_STORAGE=memory) or in the shared
+cache backend (RATE_LIMIT_STORAGE=shared, the default) so every worker
+draws from the same bucket. Limited requests are answered with 429 and
+Retry-After before routing, authentication or any database work. If the
+bucket store is unreachable requests are let through.
+"""
+import json
+import logging
+import math
+import os
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+from cache import CacheBackend, MemoryCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES = {
+    'POST /api/auth/login': {'ip': '10/60'},
+    'POST /api/auth/register': {'ip': '5/300'},
+    'GET /api/discovery/profiles': {'user': '30/60', 'ip': '120/60'},
+    'GET /api/public-chat/messages': {'user': '30/60', 'ip': '120/60'},
+    'GET /api/usernames/check': {'user': '60/60', 'ip': '120/60'},
+    'GET /api/usernames/search': {'user': '60/60', 'ip': '120/60'},
+    'GET /api/search/profiles': {'user': '30/60', 'ip': '120/60'},
+    'POST /api/uploaded-photos': {'user': '20/60'},
+    'GET /api/user/me/export': {'user': '5/3600', 'ip': '10/3600'},
+    'PUT /api/profile/me': {'user': '20/60'},
+}
+
+
+class Bucket:
+    def __init__(self, spec: str):
+        requests, seconds = spec.split('/')
+        self.capacity = float(requests)
+        self.rate = self.capacity / float(seconds)
+
+
+class Rule:
+    def __init__(self, name: str, limits: Dict[str, str]):
+        method, template = name.split(' ', 1)
+        self.name = name
+        self.method = method.upper()
+        self.pattern = re.compile('^' + re.sub(r'\\\{[^/]+?\\\}', '[^/]+', re.escape(template)) + '$')
+        self.ip = Bucket(limits['ip']) if limits.get('ip') else None
+        self.user = Bucket(limits['user']) if limits.get('user') else None
+        self.limited = 0
+
+    def matches(self, method: str, path: str) -> bool:
+        return method == self.method and self.pattern.match(path) is not None
+
+
+def rules_from_env() -> List[Rule]:
+    rules = dict(DEFAULT_RULES)
+    overrides = os.environ.get('RATE_LIMIT_RULES')
+    if overrides:
+        rules.update(json.loads(overrides))
+    return [Rule(name, limits) for name, limits in rules.items() if limits]
+
+
+class RateLimiter:
+    def __init__(self, rules: List[Rule], store: CacheBackend, identify: Callable[[dict], Optional[str]],
+                 trust_proxy: bool = False):
+        self.rules = rules
+        self.store = store
+        self.identify = identify
+        self.trust_proxy = trust_proxy
+        self.checked = 0
+
+    def client_ip(self, scope: dict, headers: Dict[str, str]) -> str:
+        if self.trust_proxy and headers.get('x-forwarded-for'):
+            # Right-most entry is the one our own proxy appended
+            return headers['x-forwarded-for'].split(',')[-1].strip()
+        client = scope.get('client')
+        return client[0] if client else 'unknown'
+
+    async def check(self, scope: dict) -> Tuple[Optional[Rule], float]:
+        """The rule that limits this request and the Retry-After, if any."""
+        method, path = scope['method'], scope['path']
+        rule = next((r for r in self.rules if r.matches(method, path)), None)
+        if rule is None:
+            return None, 0.0
+
+        self.checked += 1
+        headers = {k.decode('latin-1'): v.decode('latin-1') for k, v in scope['headers']}
+        # User bucket first: a user over their own limit must not also spend
+        # a token from the IP bucket they share with others
+        buckets = []
+        if rule.user:
+            user_id = self.identify(headers)
+            if user_id:
+                buckets.append((f"ratelimit:{rule.name}:user:{user_id}", rule.user))
+        if rule.ip:
+            buckets.append((f"ratelimit:{rule.name}:ip:{self.client_ip(scope, headers)}", rule.ip))
+
+        for key, bucket in buckets:
+            try:
+                allowed, wait = await self.store.take_token(key, bucket.rate, bucket.capacity)
+            except Exception as e:
+                logger.error(f"Rate limit store unavailable, allowing request: {e}")
+                return None, 0.0
+            if not allowed:
+                rule.limited += 1
+                return rule, wait
+        return None, 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            'checked': self.checked,
+            'limited': {rule.name: rule.limited for rule in self.rules if rule.limited}
+        }
+
+
+class RateLimitMiddleware:
+    """ASGI middleware that sheds limited requests before they reach a route."""
+
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            rule, retry_after = await self.limiter.check(scope)
+            if rule is not None:
+                response = JSONResponse(
+                    {'detail': "Too many requests, please slow down"},
+                    status_code=429,
+                    headers={'Retry-After': str(max(1, math.ceil(retry_after)))}
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+def create_rate_limiter(shared_cache: CacheBackend, identify: Callable[[dict], Optional[str]]) -> RateLimiter:
+    storage = os.environ.get('RATE_LIMIT_STORAGE', 'shared')
+    if storage == 'memory':
+        store = MemoryCache(namespace='ratelimit')
+    elif storage == 'shared':
+        store = shared_cache
+    else:
+        raise ValueError(f"Unsupported RATE_LIMIT_STORAGE: {storage}")
+    trust_proxy = os.environ.get('RATE_LIMIT_TRUST_PROXY', '').lower() in ('1', 'true', 'yes')
+    return RateLimiter(rules_from_env(), store, identify, trust_proxy)
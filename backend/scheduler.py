@@ -0,0 +1,141 @@
+"""Periodic background jobs.
+
+Each job runs in its own asyncio task on a fixed interval. Jobs that touch
+shared data take a lease in the ``job_leases`` collection first, so with
+several workers exactly one of them runs a given job per interval; the
+others record a skip. A lease outlives a crashed worker by at most its TTL.
+Jobs that only maintain per-worker state (lease=False) run everywhere.
+
+Per-job metrics (runs, skips, failures, durations, last result) are kept
+in memory and exposed through ``snapshot()``.
+"""
+import asyncio
+import logging
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    def __init__(self, name: str, interval: float, run: Callable[[], Awaitable[Any]],
+                 lease: bool = True, lease_ttl: Optional[float] = None):
+        self.name = name
+        self.interval = interval
+        self.run = run
+        self.lease = lease
+        self.lease_ttl = lease_ttl or max(interval * 2, 60)
+        self.runs = 0
+        self.skips = 0
+        self.failures = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms: Optional[float] = None
+        self.last_run_at: Optional[str] = None
+        self.last_result: Any = None
+        self.last_error: Optional[str] = None
+
+    def snapshot(self) -> dict:
+        return {
+            'interval_s': self.interval,
+            'runs': self.runs,
+            'skips': self.skips,
+            'failures': self.failures,
+            'last_ms': round(self.last_ms, 3) if self.last_ms is not None else None,
+            'avg_ms': round(self.total_ms / self.runs, 3) if self.runs else None,
+            'max_ms': round(self.max_ms, 3),
+            'last_run_at': self.last_run_at,
+            'last_result': self.last_result,
+            'last_error': self.last_error,
+        }
+
+
+class Scheduler:
+    def __init__(self, get_db, jobs: List[Job]):
+        self._get_db = get_db
+        self.jobs = jobs
+        self.owner = str(uuid.uuid4())
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def db(self):
+        return self._get_db()
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._loop(job)) for job in self.jobs]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Hand leases over right away instead of waiting for them to expire
+        if self.db is not None:
+            try:
+                await self.db.job_leases.delete_many({'owner': self.owner})
+            except Exception as e:
+                logger.error(f"Could not release job leases: {e}")
+
+    async def _acquire(self, job: Job) -> bool:
+        now = datetime.now(timezone.utc)
+        try:
+            lease = await self.db.job_leases.find_one_and_update(
+                {
+                    '_id': job.name,
+                    '$or': [{'owner': self.owner}, {'expires_at': {'$lt': now.isoformat()}}]
+                },
+                {'$set': {
+                    'owner': self.owner,
+                    'expires_at': (now + timedelta(seconds=job.lease_ttl)).isoformat()
+                }},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Held by another worker: the filter missed and the upsert collided
+            return False
+        return lease is not None and lease.get('owner') == self.owner
+
+    async def _loop(self, job: Job):
+        # Spread the first runs out so workers don't all start at once
+        await asyncio.sleep(random.uniform(0, min(job.interval, 5)))
+        while True:
+            await self.run_once(job)
+            await asyncio.sleep(job.interval)
+
+    async def run_once(self, job: Job):
+        try:
+            if job.lease and not await self._acquire(job):
+                job.skips += 1
+                return
+        except Exception as e:
+            logger.error(f"Could not acquire lease for {job.name}: {e}")
+            job.skips += 1
+            return
+
+        started = time.perf_counter()
+        try:
+            job.last_result = await job.run()
+            job.last_error = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job.failures += 1
+            job.last_error = str(e)
+            logger.error(f"Job {job.name} failed: {e}")
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            job.runs += 1
+            job.total_ms += elapsed
+            job.max_ms = max(job.max_ms, elapsed)
+            job.last_ms = elapsed
+            job.last_run_at = datetime.now(timezone.utc).isoformat()
+
+    def snapshot(self) -> Dict[str, dict]:
+        return {job.name: job.snapshot() for job in self.jobs}
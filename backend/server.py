@@ -1,41 +1,92 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Request
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.responses import StreamingResponse
+from pymongo import UpdateOne, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from bson import Binary
+import asyncio
+import hashlib
+import hmac
+import json
+import math
+import re
 import os
+import time
 import logging
 from pathlib import Path
+from contextlib import asynccontextmanager
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
 from typing import List, Optional, Dict
 import uuid
 from datetime import datetime, timezone, timedelta
 import bcrypt
 import jwt
-from emergentintegrations.payments.stripe.checkout import StripeCheckout, CheckoutSessionResponse, CheckoutStatusResponse, CheckoutSessionRequest
+from archive import archive_name, ensure_archive_collection, move_to_archive
+from cache import create_cache
+from database import PoolStats, create_mongo_client, warm_pool
+from deletion import AccountDeletions
+from export import FORMATS as EXPORT_FORMATS, SECTIONS as EXPORT_SECTIONS, stream_ndjson, stream_zip
+from images import ImagePipeline, InvalidImage, RENDITIONS, IMAGE_WORKERS, is_data_uri
+from interests import InterestTags, normalize_interest
+from moderation import ModerationEngine
+from ratelimit import RateLimitMiddleware, create_rate_limiter
+from scheduler import Job, Scheduler
+from usernames import USERNAME_COLLATION, UsernameRegistry
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# MongoDB connection (created in the app lifespan, see database.py for pool tuning)
+mongo_pool_stats = PoolStats()
+client = None
+db = None
+
+# Shared cache / pub-sub (memory:// for a single worker, redis://... across workers)
+cache = create_cache(os.environ.get('CACHE_URL', 'memory://'))
 
 # JWT Config
 JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key')
 JWT_ALGORITHM = 'HS256'
 
-# Stripe Config
-STRIPE_API_KEY = os.environ.get('STRIPE_API_KEY')
-PRO_MONTHLY_PRICE = float(os.environ.get('PRO_MONTHLY_PRICE', '19.99'))
-PROMO_FIRST_MONTH_PRICE = 9.99  # 50% off first month
+# Profile view tracking
+PROFILE_VIEW_FLUSH_INTERVAL = float(os.environ.get('PROFILE_VIEW_FLUSH_INTERVAL', '5'))
+PROFILE_VIEW_FLUSH_SIZE = int(os.environ.get('PROFILE_VIEW_FLUSH_SIZE', '500'))
+
+# Inbox and message history
+INBOX_SNIPPET_LENGTH = 120
+MESSAGE_PAGE_SIZE = 50
+
+# Discovery candidate cache
+DISCOVERY_CACHE_TTL = float(os.environ.get('DISCOVERY_CACHE_TTL', '30'))
+DISCOVERY_CELL_DEGREES = float(os.environ.get('DISCOVERY_CELL_DEGREES', '0.1'))
+DISCOVERY_CANDIDATE_LIMIT = int(os.environ.get('DISCOVERY_CANDIDATE_LIMIT', '1000'))
+DISCOVERY_RESULT_LIMIT = 200
+DISCOVERY_REFRESH_MAX_DECKS = int(os.environ.get('DISCOVERY_REFRESH_MAX_DECKS', '500'))
 
 # Security
 security = HTTPBearer()
 
-# Create the main app
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global client, db
+    client = create_mongo_client(os.environ['MONGO_URL'], mongo_pool_stats)
+    db = client[os.environ['DB_NAME']]
+    await warm_pool(client, client.options.pool_options.min_pool_size)
+    await create_indexes()
+    await backfill_match_activity()
+    await cache.start()
+    for worker in background_workers:
+        worker.start()
+    
+    yield
+    
+    for worker in reversed(background_workers):
+        await worker.stop()
+    await cache.close()
+    client.close()
+
 api_router = APIRouter(prefix="/api")
 
 # Models
@@ -105,6 +156,7 @@ class Profile(BaseModel):
     available_now: bool = False
     hosting: Optional[str] = None
     photos: List[str]
+    photo_renditions: Optional[List[Dict[str, str]]] = []
     private_photos: Optional[List[str]] = []
     social_links: Optional[Dict[str, str]] = {}
     has_private_album: bool = False
@@ -120,6 +172,18 @@ class PrivateAlbumResponse(BaseModel):
     request_id: str
     accepted: bool
 
+class PrivateAlbumRevoke(BaseModel):
+    requester_id: str
+
+class ReportResolution(BaseModel):
+    report_id: str
+    action: str = 'reviewed'  # reviewed, dismissed, actioned
+    block: bool = False  # block the reported user on the reporter's behalf
+    suspend: bool = False  # suspend the reported user's account
+
+class ReportBatchResolve(BaseModel):
+    items: List[ReportResolution]
+
 class ScreenshotAttempt(BaseModel):
     target_user_id: str
 
@@ -172,9 +236,6 @@ class Match(BaseModel):
     matched_at: str
     other_user: Optional[Profile] = None
 
-class CheckoutRequest(BaseModel):
-    origin_url: str
-
 # Auth Helper Functions
 def hash_password(password: str) -> str:
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
@@ -195,6 +256,19 @@ def decode_token(token: str) -> dict:
     except:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+def token_user_id(headers: Dict[str, str]) -> Optional[str]:
+    """user_id from a valid bearer token, without touching the database."""
+    scheme, _, token = headers.get('authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return None
+    try:
+        return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM]).get('user_id')
+    except jwt.PyJWTError:
+        return None
+
+# Rate limiting for the expensive endpoints (see ratelimit.py)
+rate_limiter = create_rate_limiter(cache, token_user_id)
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
     payload = decode_token(token)
@@ -202,8 +276,17 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     user = await db.users.find_one({'id': user_id}, {'_id': 0})
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
+    if user.get('deleted_at'):
+        raise HTTPException(status_code=401, detail="User not found")
+    if user.get('is_suspended'):
+        raise HTTPException(status_code=403, detail="Account suspended")
     return user
 
+async def get_admin_user(current_user = Depends(get_current_user)):
+    if not current_user.get('is_admin'):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
 # Calculate distance between two points
 def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     from math import radians, sin, cos, sqrt, atan2
@@ -217,6 +300,662 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     c = 2 * atan2(sqrt(a), sqrt(1-a))
     return R * c
 
+# Profile view write-behind buffer
+class ProfileViewBuffer:
+    """Collects profile views in memory and flushes them as daily rollups.
+    
+    Views are deduped per (viewer, viewed, day) so a burst of repeat opens
+    becomes a single upsert that bumps view_count and moves timestamp
+    (the last time the viewer was seen) forward.
+    """
+    
+    def __init__(self, flush_interval: float, flush_size: int):
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self._pending: Dict[tuple, dict] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+    
+    def record(self, viewer_id: str, viewed_id: str):
+        now = datetime.now(timezone.utc)
+        key = (viewer_id, viewed_id, now.date().isoformat())
+        entry = self._pending.get(key)
+        if entry:
+            entry['count'] += 1
+            entry['timestamp'] = now.isoformat()
+        else:
+            self._pending[key] = {'count': 1, 'timestamp': now.isoformat()}
+        if len(self._pending) >= self.flush_size:
+            self._wakeup.set()
+    
+    async def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        operations = [
+            UpdateOne(
+                {'viewer_id': viewer_id, 'viewed_id': viewed_id, 'day': day},
+                {
+                    '$inc': {'view_count': entry['count']},
+                    '$max': {'timestamp': entry['timestamp']},
+                    '$setOnInsert': {'id': str(uuid.uuid4())}
+                },
+                upsert=True
+            )
+            for (viewer_id, viewed_id, day), entry in batch.items()
+        ]
+        try:
+            await db.profile_views.bulk_write(operations, ordered=False)
+            return
+        except BulkWriteError as e:
+            # The other upserts were applied; only the failed ones go back
+            keys = list(batch)
+            failed = [keys[error['index']] for error in e.details.get('writeErrors', [])]
+            logger.error(f"Profile view flush partly failed, requeueing {len(failed)} of {len(batch)} rollups")
+        except Exception as e:
+            failed = list(batch)
+            logger.error(f"Profile view flush failed, requeueing {len(batch)} rollups: {e}")
+        for key in failed:
+            entry = batch[key]
+            pending = self._pending.setdefault(key, {'count': 0, 'timestamp': entry['timestamp']})
+            pending['count'] += entry['count']
+            pending['timestamp'] = max(pending['timestamp'], entry['timestamp'])
+    
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+    
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+profile_view_buffer = ProfileViewBuffer(PROFILE_VIEW_FLUSH_INTERVAL, PROFILE_VIEW_FLUSH_SIZE)
+
+# Discovery candidate cache
+class DiscoveryCache:
+    """Shared, short-lived candidate lists keyed by geo cell and filters.
+    
+    Searchers are bucketed into square cells of DISCOVERY_CELL_DEGREES. An
+    entry holds [user_id, version, latitude, longitude, interest_ids,
+    available_now, hosting] for every profile
+    matching the filters within the distance limit of anywhere in the cell,
+    so exact distances and per-user exclusions (likes, passes, self, online
+    status) are applied per request on top of it. Entries hold at most
+    candidate_limit profiles in a stable order; a user whose swipes use up
+    most of a full entry gets an uncached load that excludes them up front.
+    
+    Each cell has a generation counter that is part of the entry key. A
+    profile write bumps the generation of its cell and the surrounding
+    ring, which drops every filter combination for those searchers at once;
+    searchers further away see the change when the TTL runs out.
+    
+    Recently requested (cell, filters) decks are remembered per worker so the
+    deck refresh job can rebuild them before they expire. Workers claim each
+    entry through a shared counter before rebuilding it, so a deck several
+    workers remember is rebuilt once per refresh cycle.
+    """
+    
+    def __init__(self, ttl: float, cell_degrees: float, candidate_limit: int):
+        self.ttl = ttl
+        self.cell_degrees = cell_degrees
+        self.candidate_limit = candidate_limit
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.refreshes = 0
+        self.refills = 0
+        self._recent: Dict[str, tuple] = {}
+    
+    def cell(self, latitude: float, longitude: float) -> tuple:
+        return (math.floor(latitude / self.cell_degrees), math.floor(longitude / self.cell_degrees))
+    
+    def _generation_key(self, cell: tuple) -> str:
+        return f"discovery:gen:{cell[0]}:{cell[1]}"
+    
+    async def _entry_key(self, cell: tuple, deck: str) -> str:
+        generation = await cache.get(self._generation_key(cell)) or 0
+        return f"discovery:v3:{cell[0]}:{cell[1]}:{generation}:{deck}"
+    
+    async def candidates(self, latitude: float, longitude: float, filters: dict, distance_limit: float) -> List[list]:
+        cell = self.cell(latitude, longitude)
+        if self.ttl <= 0:
+            self.misses += 1
+            return await self._load(cell, filters, distance_limit)
+        
+        deck = make_etag(sorted(filters.items()), distance_limit).strip('"')
+        self._remember(cell, deck, filters, distance_limit)
+        key = await self._entry_key(cell, deck)
+        entry = await cache.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        
+        self.misses += 1
+        entry = await self._load(cell, filters, distance_limit)
+        await cache.set(key, entry, ttl=self.ttl)
+        return entry
+    
+    async def candidates_for(self, latitude: float, longitude: float, filters: dict, distance_limit: float,
+                             excluded_ids: set) -> List[list]:
+        """The shared candidates minus excluded_ids, refilled when that empties the deck."""
+        from ranking import unseen_candidates
+        shared = await self.candidates(latitude, longitude, filters, distance_limit)
+        remaining, refill = unseen_candidates(shared, excluded_ids, self.candidate_limit, DISCOVERY_RESULT_LIMIT)
+        if refill:
+            self.refills += 1
+            remaining = await self._load(self.cell(latitude, longitude), filters, distance_limit, excluded_ids)
+        return remaining
+    
+    def _remember(self, cell: tuple, deck: str, filters: dict, distance_limit: float):
+        recent_key = f"{cell[0]}:{cell[1]}:{deck}"
+        self._recent.pop(recent_key, None)
+        self._recent[recent_key] = (cell, deck, filters, distance_limit, time.monotonic())
+        while len(self._recent) > DISCOVERY_REFRESH_MAX_DECKS:
+            del self._recent[next(iter(self._recent))]
+    
+    async def refresh(self) -> int:
+        """Rebuild decks requested within the last two TTLs before they expire."""
+        cutoff = time.monotonic() - 2 * self.ttl
+        for recent_key in [k for k, v in self._recent.items() if v[4] < cutoff]:
+            del self._recent[recent_key]
+        
+        refreshed = 0
+        for cell, deck, filters, distance_limit, _ in list(self._recent.values()):
+            key = await self._entry_key(cell, deck)
+            # Another worker already rebuilt this entry during this cycle
+            if await cache.incr(f"{key}:refresh", ttl=self.ttl / 2) > 1:
+                continue
+            entry = await self._load(cell, filters, distance_limit)
+            await cache.set(key, entry, ttl=self.ttl)
+            refreshed += 1
+        self.refreshes += refreshed
+        return refreshed
+    
+    async def _load(self, cell: tuple, filters: dict, distance_limit: float,
+                    excluded_ids: Optional[set] = None) -> List[list]:
+        # Bounding box around the cell, wide enough for any searcher inside it
+        center_lat = (cell[0] + 0.5) * self.cell_degrees
+        center_lon = (cell[1] + 0.5) * self.cell_degrees
+        reach_km = distance_limit + calculate_distance(
+            center_lat, center_lon,
+            center_lat + self.cell_degrees / 2, center_lon + self.cell_degrees / 2
+        )
+        lat_delta = reach_km / 111.0
+        lon_delta = reach_km / (111.0 * max(math.cos(math.radians(center_lat)), 0.01))
+        
+        query = {
+            **filters,
+            'suspended': {'$ne': True},
+            'latitude': {'$gte': center_lat - lat_delta, '$lte': center_lat + lat_delta}
+        }
+        if lon_delta < 180:
+            query['longitude'] = {'$gte': center_lon - lon_delta, '$lte': center_lon + lon_delta}
+        else:
+            query['longitude'] = {'$ne': None}
+        if excluded_ids:
+            query['user_id'] = {'$nin': sorted(excluded_ids)}
+        
+        # Stable order, so the cut at candidate_limit is the same on every load
+        profiles = await db.profiles.find(
+            query,
+            {'_id': 0, 'user_id': 1, 'version': 1, 'latitude': 1, 'longitude': 1,
+             'interest_ids': 1, 'available_now': 1, 'hosting': 1}
+        ).sort('user_id', 1).to_list(self.candidate_limit)
+        return [
+            [p['user_id'], p.get('version', 0), p['latitude'], p['longitude'],
+             p.get('interest_ids') or [], bool(p.get('available_now')), p.get('hosting')]
+            for p in profiles
+        ]
+    
+    async def invalidate(self, *locations: tuple):
+        cells = set()
+        for latitude, longitude in locations:
+            if latitude is None or longitude is None:
+                continue
+            lat_cell, lon_cell = self.cell(latitude, longitude)
+            cells.update(
+                (lat_cell + d_lat, lon_cell + d_lon)
+                for d_lat in (-1, 0, 1) for d_lon in (-1, 0, 1)
+            )
+        for cell in cells:
+            await cache.incr(self._generation_key(cell))
+        self.invalidations += len(cells)
+    
+    def snapshot(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'cell_invalidations': self.invalidations,
+            'deck_refreshes': self.refreshes,
+            'deck_refills': self.refills
+        }
+
+discovery_cache = DiscoveryCache(DISCOVERY_CACHE_TTL, DISCOVERY_CELL_DEGREES, DISCOVERY_CANDIDATE_LIMIT)
+
+# Private album access grants
+ALBUM_GRANT_CACHE_TTL = float(os.environ.get('ALBUM_GRANT_CACHE_TTL', '300'))
+ALBUM_GRANT_CACHE_OWNERS = 10_000
+
+class AlbumGrantCache:
+    """Per-worker near cache of who may see each owner's private album.
+    
+    Holds the set of accepted requester ids per owner, loaded in one query
+    the first time the owner's profile is viewed. Respond and revoke call
+    invalidate(), which goes through the shared cache's invalidation
+    channel so every worker drops its copy; the TTL is only a safety net.
+    """
+    
+    def __init__(self, ttl: float, max_owners: int):
+        self.ttl = ttl
+        self.max_owners = max_owners
+        self._grants: Dict[str, tuple] = {}
+        cache.on_invalidate(self._on_invalidate)
+    
+    def _key(self, owner_id: str) -> str:
+        return f"album-grants:{owner_id}"
+    
+    def _on_invalidate(self, keys: List[str]):
+        for key in keys:
+            if key.startswith('album-grants:'):
+                self._grants.pop(key[len('album-grants:'):], None)
+    
+    async def has_access(self, owner_id: str, requester_id: str) -> bool:
+        entry = self._grants.get(owner_id)
+        if entry is None or entry[1] <= time.monotonic():
+            grants = await db.private_album_access.find(
+                {'owner_id': owner_id, 'status': 'accepted'},
+                {'_id': 0, 'requester_id': 1}
+            ).to_list(None)
+            if len(self._grants) >= self.max_owners:
+                self._grants.pop(next(iter(self._grants)))
+            entry = (frozenset(g['requester_id'] for g in grants), time.monotonic() + self.ttl)
+            self._grants[owner_id] = entry
+        return requester_id in entry[0]
+    
+    async def invalidate(self, owner_id: str):
+        self._grants.pop(owner_id, None)
+        await cache.invalidate(self._key(owner_id))
+
+album_grants = AlbumGrantCache(ALBUM_GRANT_CACHE_TTL, ALBUM_GRANT_CACHE_OWNERS)
+
+# Interest tag dictionary (see interests.py)
+interest_tags = InterestTags(lambda: db)
+
+# Username availability filter (see usernames.py)
+username_registry = UsernameRegistry(lambda: db, cache)
+USERNAME_SEARCH_LIMIT = 20
+
+# Profile search (weighted text index, see create_indexes)
+PROFILE_SEARCH_PAGE_SIZE = 20
+PROFILE_SEARCH_MAX_PAGE_SIZE = 50
+PROFILE_TEXT_WEIGHTS = {'username': 10, 'interests': 5, 'bio': 1}
+PROFILE_CARD_FIELDS = ['user_id', 'username', 'name', 'age', 'bio', 'interests', 'position', 'tribe',
+                       'looking_for', 'available_now', 'hosting', 'photos', 'photo_renditions']
+
+# Photo renditions
+image_pipeline = ImagePipeline(IMAGE_WORKERS)
+
+# Content screening of chat and public messages (see moderation.py)
+MODERATION_TERMS_FILE = Path(os.environ.get('MODERATION_TERMS_FILE', str(ROOT_DIR / 'moderation_terms.txt')))
+MODERATION_WORKERS = int(os.environ.get('MODERATION_WORKERS', '1'))
+MODERATION_FLAGGED_LIMIT = 100
+moderation = ModerationEngine(MODERATION_TERMS_FILE, MODERATION_WORKERS)
+
+async def apply_moderation(results: List[tuple]):
+    """Record matches on the screened messages; hidden ones also leave the inbox preview."""
+    screened_at = datetime.now(timezone.utc).isoformat()
+    updates = {'messages': [], 'public_messages': []}
+    previews = []
+    for ref, terms, action in results:
+        fields = {'moderation': {
+            'status': 'hidden' if action == 'hide' else 'flagged',
+            'terms': terms,
+            'screened_at': screened_at
+        }}
+        if action == 'hide':
+            fields['hidden'] = True
+            if ref.get('match_id'):
+                previews.append(UpdateOne(
+                    {'id': ref['match_id'], 'last_message.id': ref['id']},
+                    {'$set': {'last_message.snippet': '', 'last_message.hidden': True}, '$inc': {'version': 1}}
+                ))
+        updates[ref['collection']].append(UpdateOne({'id': ref['id']}, {'$set': fields}))
+    
+    for collection, operations in updates.items():
+        if operations:
+            await db[collection].bulk_write(operations, ordered=False)
+    if previews:
+        await db.matches.bulk_write(previews, ordered=False)
+    hidden = sum(1 for _, _, action in results if action == 'hide')
+    counters = {'messages_flagged': len(results) - hidden, 'messages_hidden': hidden}
+    await db.counters.update_one({'_id': 'moderation'}, {'$inc': {k: v for k, v in counters.items() if v}}, upsert=True)
+
+moderation.configure(cache, apply_moderation)
+
+def public_base_url(request: Request) -> str:
+    return os.environ.get('PUBLIC_BASE_URL') or str(request.base_url).rstrip('/')
+
+async def store_photo(user_id: str, data_uri: str, base_url: str, private: bool = False,
+                      match_id: Optional[str] = None) -> Dict[str, str]:
+    """Render an uploaded data URI and return the URL of each rendition.
+    
+    Private photos (album photos, and chat images, which carry their
+    match_id) are only served through URLs from sign_private_photos.
+    """
+    try:
+        renditions = await image_pipeline.process(data_uri)
+    except InvalidImage as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    photo_id = str(uuid.uuid4())
+    await db.photo_renditions.insert_one({
+        'id': photo_id,
+        'user_id': user_id,
+        'renditions': {
+            name: {**rendition, 'data': Binary(rendition['data'])}
+            for name, rendition in renditions.items()
+        },
+        'private': private or match_id is not None,
+        'match_id': match_id,
+        'created_at': datetime.now(timezone.utc).isoformat()
+    })
+    return {name: f"{base_url}/api/photos/{photo_id}/{name}" for name in RENDITIONS}
+
+# Our own rendition URLs, as handed out by store_photo (signed or not)
+OWN_PHOTO_URL = re.compile(r'^(?P<base>.*)/api/photos/(?P<id>[^/?#]+)/(?P<rendition>[a-z]+)(?:\?.*)?$')
+
+async def ingest_photos(user_id: str, photos: List[str], base_url: str, private: bool = False) -> List[Dict[str, str]]:
+    """Rendition URLs for each photo in a profile's photo list.
+    
+    Data URIs are rendered and stored. URLs of renditions this user already
+    has (clients send back what they were given) map to that photo's stored
+    renditions; anything else is an external URL and passes through.
+    """
+    own = {}
+    for photo in photos:
+        match = OWN_PHOTO_URL.match(photo)
+        if match and not is_data_uri(photo):
+            own[photo] = match
+    stored = {}
+    if own:
+        docs = await db.photo_renditions.find(
+            {'id': {'$in': list({m['id'] for m in own.values()})}, 'user_id': user_id},
+            {'_id': 0, 'id': 1, 'private': 1, **{f'renditions.{name}.width': 1 for name in RENDITIONS}}
+        ).to_list(None)
+        stored = {doc['id']: doc for doc in docs}
+        # A photo moved between the public and private lists follows the list
+        moved = [doc['id'] for doc in docs if bool(doc.get('private')) != private]
+        if moved:
+            await db.photo_renditions.update_many({'id': {'$in': moved}}, {'$set': {'private': private}})
+    
+    async def ingest(photo: str) -> Dict[str, str]:
+        if is_data_uri(photo):
+            return await store_photo(user_id, photo, base_url, private=private)
+        match = own.get(photo)
+        if match and match['id'] in stored:
+            names = stored[match['id']].get('renditions', {})
+            return {name: f"{match['base']}/api/photos/{match['id']}/{name if name in names else 'full'}" for name in RENDITIONS}
+        return {name: photo for name in RENDITIONS}
+    return list(await asyncio.gather(*[ingest(photo) for photo in photos]))
+
+# Private album photos are served only through short-lived URLs signed for
+# one viewer; the grant is checked again on every fetch
+PRIVATE_PHOTO_URL_TTL = int(os.environ.get('PRIVATE_PHOTO_URL_TTL', '600'))
+
+def private_photo_signature(photo_id: str, viewer_id: str, expires: int) -> str:
+    message = f"{photo_id}:{viewer_id}:{expires}".encode()
+    return hmac.new(JWT_SECRET.encode(), message, hashlib.sha256).hexdigest()
+
+def private_photo_window() -> int:
+    # Expiry rounded to the TTL so URLs (and ETags) stay stable within a window
+    return (int(time.time()) // PRIVATE_PHOTO_URL_TTL + 2) * PRIVATE_PHOTO_URL_TTL
+
+def sign_private_photos(urls: List[str], viewer_id: str) -> List[str]:
+    expires = private_photo_window()
+    signed = []
+    for url in urls:
+        match = OWN_PHOTO_URL.match(url)
+        if not match:
+            signed.append(url)
+            continue
+        base = url.split('?', 1)[0]
+        signature = private_photo_signature(match['id'], viewer_id, expires)
+        signed.append(f"{base}?viewer={viewer_id}&expires={expires}&sig={signature}")
+    return signed
+
+def sign_message_photos(messages: List[dict], viewer_id: str) -> List[dict]:
+    for message in messages:
+        if message.get('message_type') == 'image':
+            for field in ('content', 'photo_url'):
+                if message.get(field):
+                    message[field] = sign_private_photos([message[field]], viewer_id)[0]
+    return messages
+
+def own_photo_ids(urls: List[Optional[str]]) -> List[str]:
+    return [match['id'] for match in (OWN_PHOTO_URL.match(url or '') for url in urls) if match]
+
+def use_photo_rendition(profile: Optional[dict], rendition: str):
+    """Point a profile's photos at the rendition that fits the view."""
+    if profile and profile.get('photo_renditions'):
+        profile['photos'] = [r.get(rendition, r.get('full')) for r in profile['photo_renditions']]
+    return profile
+
+# Conditional GET: profiles and matches carry a `version` that every write
+# increments, so validators are built from versions alone without loading
+# the documents they describe
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1(json.dumps(parts, separators=(',', ':'), default=str).encode()).hexdigest()
+    return f'"{digest}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    tags = [tag.strip() for tag in header.split(',')]
+    return etag in [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+
+def set_etag(response: Response, etag: str):
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'private, no-cache'
+
+def not_modified(etag: str) -> Response:
+    response = Response(status_code=304)
+    set_etag(response, etag)
+    return response
+
+# Maintenance jobs (see scheduler.py); request handlers only read the results
+PUBLIC_CHAT_WINDOW = timedelta(hours=24)
+AVAILABLE_NOW_TTL = timedelta(hours=float(os.environ.get('AVAILABLE_NOW_TTL_HOURS', '4')))
+MAINTENANCE_BATCH_SIZE = 500
+MESSAGE_ARCHIVE_AFTER = timedelta(days=int(os.environ.get('MESSAGE_ARCHIVE_DAYS', '180')))
+SWIPE_ARCHIVE_AFTER = timedelta(days=30 * int(os.environ.get('SWIPE_ARCHIVE_MONTHS', '6')))
+ARCHIVE_MAX_BATCHES = 20
+
+async def reset_daily_swipes():
+    now = datetime.now(timezone.utc)
+    result = await db.users.update_many(
+        {'last_swipe_reset': {'$lt': (now - timedelta(days=1)).isoformat()}},
+        {'$set': {'daily_swipes': 0, 'last_swipe_reset': now.isoformat()}}
+    )
+    return {'reset': result.modified_count}
+
+async def expire_public_messages():
+    cutoff = (datetime.now(timezone.utc) - PUBLIC_CHAT_WINDOW).isoformat()
+    result = await db.public_messages.delete_many({'timestamp': {'$lt': cutoff}})
+    return {'deleted': result.deleted_count}
+
+async def expire_availability():
+    cutoff = (datetime.now(timezone.utc) - AVAILABLE_NOW_TTL).isoformat()
+    stale_filter = {
+        'available_now': True,
+        '$or': [{'available_now_at': {'$lt': cutoff}}, {'available_now_at': None}]
+    }
+    expired = 0
+    while True:
+        stale = await db.profiles.find(
+            stale_filter,
+            {'_id': 0, 'user_id': 1, 'latitude': 1, 'longitude': 1}
+        ).limit(MAINTENANCE_BATCH_SIZE).to_list(MAINTENANCE_BATCH_SIZE)
+        if not stale:
+            break
+        await db.profiles.update_many(
+            {'user_id': {'$in': [p['user_id'] for p in stale]}, **stale_filter},
+            {'$set': {'available_now': False}, '$inc': {'version': 1}}
+        )
+        await discovery_cache.invalidate(*[(p.get('latitude'), p.get('longitude')) for p in stale])
+        expired += len(stale)
+        if len(stale) < MAINTENANCE_BATCH_SIZE:
+            break
+    return {'expired': expired}
+
+async def reconcile_like_counters():
+    """Repair likes_received_count drift against the likes collection."""
+    fixed = 0
+    last_id = ''
+    while True:
+        users = await db.users.find(
+            {'id': {'$gt': last_id}},
+            {'_id': 0, 'id': 1, 'likes_received_count': 1}
+        ).sort('id', 1).limit(MAINTENANCE_BATCH_SIZE).to_list(MAINTENANCE_BATCH_SIZE)
+        if not users:
+            break
+        last_id = users[-1]['id']
+        
+        counts = await db.likes.aggregate([
+            {'$match': {'target_user_id': {'$in': [u['id'] for u in users]}}},
+            {'$group': {'_id': '$target_user_id', 'count': {'$sum': 1}}}
+        ]).to_list(None)
+        actual = {c['_id']: c['count'] for c in counts}
+        operations = [
+            UpdateOne({'id': u['id']}, {'$set': {'likes_received_count': actual.get(u['id'], 0)}})
+            for u in users
+            if u.get('likes_received_count') != actual.get(u['id'], 0)
+        ]
+        if operations:
+            await db.users.bulk_write(operations, ordered=False)
+            fixed += len(operations)
+    return {'fixed': fixed}
+
+async def record_archived_history(messages: List[dict]):
+    # get_messages only looks in the archive for matches with archived_through
+    archived_through = {}
+    for message in messages:
+        archived_through[message['match_id']] = max(message['seq'], archived_through.get(message['match_id'], message['seq']))
+    await db.matches.bulk_write([
+        UpdateOne({'id': match_id}, {'$max': {'archived_through': seq}})
+        for match_id, seq in archived_through.items()
+    ], ordered=False)
+
+async def archive_messages():
+    """Move old and soft-deleted messages to messages_archive (see archive.py)."""
+    cutoff = (datetime.now(timezone.utc) - MESSAGE_ARCHIVE_AFTER).isoformat()
+    # Messages still waiting for a seq stay hot until their match is indexed.
+    # Soft-deleted messages are never read back, so they don't mark history.
+    old = await move_to_archive(db, 'messages', {'timestamp': {'$lt': cutoff}, 'seq': {'$exists': True}},
+                                MAINTENANCE_BATCH_SIZE, ARCHIVE_MAX_BATCHES, on_batch=record_archived_history)
+    deleted = await move_to_archive(db, 'messages', {'deleted': True, 'seq': {'$exists': True}},
+                                    MAINTENANCE_BATCH_SIZE, ARCHIVE_MAX_BATCHES)
+    return {'old': old, 'deleted': deleted}
+
+# Targets of archived swipes, one small document per user in swipe_history
+# ({user_id, liked: [...], passed: [...]}), so discovery and the mutual like
+# check never read the archives
+SWIPE_HISTORY_FIELDS = {'likes': 'liked', 'passes': 'passed'}
+
+def record_swipe_history(collection: str):
+    async def record(docs: List[dict]):
+        targets: Dict[str, List[str]] = {}
+        for doc in docs:
+            targets.setdefault(doc['user_id'], []).append(doc['target_user_id'])
+        await db.swipe_history.bulk_write([
+            UpdateOne(
+                {'user_id': user_id},
+                {'$addToSet': {SWIPE_HISTORY_FIELDS[collection]: {'$each': ids}}},
+                upsert=True
+            )
+            for user_id, ids in targets.items()
+        ], ordered=False)
+    return record
+
+async def archive_swipes():
+    """Move likes and passes past the swipe history window to their archives.
+    
+    The targets stay in swipe_history, so archived swipes still hide a
+    profile from discovery and still complete a match; they no longer count
+    towards likes_received_count or show up in who-liked-me.
+    """
+    cutoff = (datetime.now(timezone.utc) - SWIPE_ARCHIVE_AFTER).isoformat()
+    moved = {}
+    for collection in ('likes', 'passes'):
+        moved[collection] = await move_to_archive(db, collection, {'timestamp': {'$lt': cutoff}},
+                                                  MAINTENANCE_BATCH_SIZE, ARCHIVE_MAX_BATCHES,
+                                                  on_batch=record_swipe_history(collection))
+    return moved
+
+async def has_swiped(collection: str, user_id: str, target_user_id: str) -> bool:
+    """Whether user_id liked (or passed) target_user_id, recently or long ago."""
+    if await db[collection].find_one({'user_id': user_id, 'target_user_id': target_user_id}, {'_id': 1}):
+        return True
+    field = SWIPE_HISTORY_FIELDS[collection]
+    return await db.swipe_history.find_one({'user_id': user_id, field: target_user_id}, {'_id': 1}) is not None
+
+async def swiped_user_ids(user_id: str) -> set:
+    """Everyone user_id has liked or passed, recently or long ago."""
+    swiped = set()
+    for collection in ('likes', 'passes'):
+        swipes = await db[collection].find({'user_id': user_id}, {'_id': 0, 'target_user_id': 1}).to_list(None)
+        swiped.update(s['target_user_id'] for s in swipes)
+    history = await db.swipe_history.find_one({'user_id': user_id}, {'_id': 0, 'liked': 1, 'passed': 1})
+    if history:
+        swiped.update(history.get('liked', []), history.get('passed', []))
+    return swiped
+
+# Account deletion cascade (see deletion.py)
+account_deletions = AccountDeletions(lambda: db)
+
+async def process_account_deletions():
+    return await account_deletions.run()
+
+async def refresh_discovery_decks():
+    return {'refreshed': await discovery_cache.refresh()}
+
+maintenance_jobs = [
+    Job('reset_daily_swipes', 300, reset_daily_swipes),
+    Job('expire_public_messages', 60, expire_public_messages),
+    Job('expire_availability', 300, expire_availability),
+    Job('reconcile_like_counters', 3600, reconcile_like_counters),
+    Job('archive_messages', 3600, archive_messages),
+    Job('archive_swipes', 3600, archive_swipes),
+    Job('process_account_deletions', 15, process_account_deletions),
+]
+if DISCOVERY_CACHE_TTL > 0:
+    # Decks are remembered per worker, so every worker refreshes its own;
+    # entries another worker already rebuilt this cycle are skipped
+    maintenance_jobs.append(Job('refresh_discovery_decks', DISCOVERY_CACHE_TTL * 0.75, refresh_discovery_decks, lease=False))
+scheduler = Scheduler(lambda: db, maintenance_jobs)
+
+# Long-running tasks started and stopped with the app (start() / async stop())
+background_workers = [profile_view_buffer, image_pipeline, moderation, interest_tags, username_registry, scheduler]
+
 # Auth Routes
 @api_router.post("/auth/register")
 async def register(user_data: UserRegister):
@@ -267,37 +1006,61 @@ async def update_activity(current_user = Depends(get_current_user)):
 
 # Profile Routes
 @api_router.post("/profile")
-async def create_profile(profile_data: ProfileCreate, current_user = Depends(get_current_user)):
+async def create_profile(profile_data: ProfileCreate, request: Request, current_user = Depends(get_current_user)):
     existing = await db.profiles.find_one({'user_id': current_user['id']}, {'_id': 0})
     if existing:
         raise HTTPException(status_code=400, detail="Profile already exists")
     
-    # Check if username is already taken
-    username_exists = await db.profiles.find_one({'username': profile_data.username}, {'_id': 0})
-    if username_exists:
+    # Check if username is already taken (any case)
+    if await username_registry.owner(profile_data.username):
         raise HTTPException(status_code=400, detail="Username already taken")
     
     # Limit photos to 5
     if len(profile_data.photos) > 5:
         raise HTTPException(status_code=400, detail="Maximum 5 photos allowed")
     
+    base_url = public_base_url(request)
+    photo_renditions = await ingest_photos(current_user['id'], profile_data.photos, base_url)
+    private_renditions = await ingest_photos(current_user['id'], profile_data.private_photos, base_url, private=True)
+    
     profile_id = str(uuid.uuid4())
     profile = {
         'id': profile_id,
         'user_id': current_user['id'],
         **profile_data.model_dump(),
+        'photos': [r['full'] for r in photo_renditions],
+        'photo_renditions': photo_renditions,
+        'private_photos': [r['full'] for r in private_renditions],
+        'interest_ids': await interest_tags.ids(profile_data.interests),
         'has_private_album': len(profile_data.private_photos) > 0,
+        'available_now_at': datetime.now(timezone.utc).isoformat() if profile_data.available_now else None,
+        'version': 1,
         'created_at': datetime.now(timezone.utc).isoformat()
     }
     
-    await db.profiles.insert_one(profile)
+    try:
+        await db.profiles.insert_one(profile)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Username already taken")
+    await username_registry.taken(profile_data.username)
+    await discovery_cache.invalidate((profile.get('latitude'), profile.get('longitude')))
     return {'message': 'Profile created', 'profile_id': profile_id}
 
 @api_router.get("/profile/me", response_model=Profile)
-async def get_my_profile(current_user = Depends(get_current_user)):
+async def get_my_profile(request: Request, response: Response, current_user = Depends(get_current_user)):
+    if request.headers.get('if-none-match'):
+        current = await db.profiles.find_one({'user_id': current_user['id']}, {'_id': 0, 'version': 1})
+        if not current:
+            raise HTTPException(status_code=404, detail="Profile not found")
+        etag = make_etag('profile-me', current.get('version', 0), private_photo_window())
+        if etag_matches(request, etag):
+            return not_modified(etag)
+    
     profile = await db.profiles.find_one({'user_id': current_user['id']}, {'_id': 0})
     if not profile:
         raise HTTPException(status_code=404, detail="Profile not found")
+    profile['private_photos'] = sign_private_photos(profile.get('private_photos') or [], current_user['id'])
+    set_etag(response, make_etag('profile-me', profile.get('version', 0), private_photo_window()))
     return profile
 
 @api_router.get("/user/me")
@@ -310,64 +1073,312 @@ async def get_my_user_info(current_user = Depends(get_current_user)):
         'created_at': current_user.get('created_at')
     }
 
+# Data exports stream straight from cursors (see export.py); each worker
+# runs a few at a time so they stay background work
+EXPORT_CONCURRENCY = int(os.environ.get('EXPORT_CONCURRENCY', '2'))
+export_slots = asyncio.Semaphore(EXPORT_CONCURRENCY)
+
+class ExportResponse(StreamingResponse):
+    """Streams an export and gives back its slot however the response ends.
+    
+    The slot is taken by the handler, so a response whose body never starts
+    (client gone, error before the first chunk) still releases it.
+    """
+    
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            export_slots.release()
+
+@api_router.get("/user/me/export")
+async def export_my_data(format: str = 'zip', sections: Optional[str] = None, current_user = Depends(get_current_user)):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format must be one of: {', '.join(EXPORT_FORMATS)}")
+    
+    # A subset of sections resumes an export that was cut off
+    wanted = list(EXPORT_SECTIONS)
+    if sections:
+        wanted = list(dict.fromkeys(s.strip() for s in sections.split(',') if s.strip()))
+        unknown = [s for s in wanted if s not in EXPORT_SECTIONS]
+        if unknown or not wanted:
+            raise HTTPException(status_code=400, detail=f"Unknown sections: {', '.join(unknown)}")
+    
+    # Taken without waiting (nothing awaits between the check and the
+    # acquire); ExportResponse releases it
+    if export_slots.locked():
+        raise HTTPException(status_code=503, detail="Exports are busy, please try again shortly", headers={'Retry-After': '30'})
+    await export_slots.acquire()
+    
+    stream = stream_zip if format == 'zip' else stream_ndjson
+    filename = f"sparkmate-export-{datetime.now(timezone.utc).strftime('%Y%m%d')}.{format}"
+    try:
+        return ExportResponse(
+            stream(db, current_user['id'], wanted),
+            media_type=EXPORT_FORMATS[format],
+            headers={'Content-Disposition': f'attachment; filename="{filename}"', 'Cache-Control': 'no-store'}
+        )
+    except BaseException:
+        export_slots.release()
+        raise
+
+@api_router.delete("/user/me", status_code=202)
+async def delete_my_account(current_user = Depends(get_current_user)):
+    # Sign-in details go now so the account is unusable and the email can
+    # be registered again; everything else is removed by the cascade
+    await db.users.update_one(
+        {'id': current_user['id']},
+        {
+            '$set': {'deleted_at': datetime.now(timezone.utc).isoformat()},
+            '$unset': {'email': '', 'phone': '', 'password': ''}
+        }
+    )
+    profile = await db.profiles.find_one_and_update(
+        {'user_id': current_user['id']},
+        {'$set': {'suspended': True}, '$inc': {'version': 1}},
+        projection={'_id': 0, 'latitude': 1, 'longitude': 1}
+    )
+    if profile:
+        await discovery_cache.invalidate((profile.get('latitude'), profile.get('longitude')))
+    
+    deletion = await account_deletions.request(current_user['id'])
+    return {'message': 'Account deletion started', 'deletion_id': deletion['id'], 'status': deletion['status']}
+
+@api_router.get("/account-deletions/{deletion_id}")
+async def get_account_deletion(deletion_id: str):
+    # Unauthenticated (no session survives the deletion), so this is only the
+    # job's progress; the id is only ever shown to the account owner
+    deletion = await account_deletions.status(deletion_id)
+    if not deletion:
+        raise HTTPException(status_code=404, detail="Deletion not found")
+    return deletion
+
 @api_router.put("/profile/me")
-async def update_profile(profile_data: ProfileUpdate, current_user = Depends(get_current_user)):
+async def update_profile(profile_data: ProfileUpdate, request: Request, current_user = Depends(get_current_user)):
     update_data = {k: v for k, v in profile_data.model_dump().items() if v is not None}
     if not update_data:
         raise HTTPException(status_code=400, detail="No data to update")
     
     # Check if username is being updated and if it's already taken
     if 'username' in update_data:
-        username_exists = await db.profiles.find_one({
-            'username': update_data['username'],
-            'user_id': {'$ne': current_user['id']}
-        }, {'_id': 0})
-        if username_exists:
+        owner = await username_registry.owner(update_data['username'])
+        if owner and owner != current_user['id']:
             raise HTTPException(status_code=400, detail="Username already taken")
     
     # Limit photos to 5
     if 'photos' in update_data and len(update_data['photos']) > 5:
         raise HTTPException(status_code=400, detail="Maximum 5 photos allowed")
     
+    # Store renditions for newly uploaded photos
+    if 'photos' in update_data:
+        photo_renditions = await ingest_photos(current_user['id'], update_data['photos'], public_base_url(request))
+        update_data['photos'] = [r['full'] for r in photo_renditions]
+        update_data['photo_renditions'] = photo_renditions
+    if 'private_photos' in update_data:
+        private_renditions = await ingest_photos(current_user['id'], update_data['private_photos'], public_base_url(request), private=True)
+        update_data['private_photos'] = [r['full'] for r in private_renditions]
+    
+    if 'interests' in update_data:
+        update_data['interest_ids'] = await interest_tags.ids(update_data['interests'])
+    
     # Update has_private_album flag
     if 'private_photos' in update_data:
         update_data['has_private_album'] = len(update_data['private_photos']) > 0
     
-    await db.profiles.update_one(
+    # Availability expires AVAILABLE_NOW_TTL after it was switched on
+    if update_data.get('available_now'):
+        update_data['available_now_at'] = datetime.now(timezone.utc).isoformat()
+    
+    previous = await db.profiles.find_one(
         {'user_id': current_user['id']},
-        {'$set': update_data}
+        {'_id': 0, 'latitude': 1, 'longitude': 1}
+    ) or {}
+    try:
+        await db.profiles.update_one(
+            {'user_id': current_user['id']},
+            {'$set': update_data, '$inc': {'version': 1}}
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Username already taken")
+    if 'username' in update_data:
+        await username_registry.taken(update_data['username'])
+    await discovery_cache.invalidate(
+        (previous.get('latitude'), previous.get('longitude')),
+        (update_data.get('latitude', previous.get('latitude')), update_data.get('longitude', previous.get('longitude')))
     )
     return {'message': 'Profile updated'}
 
+# Username Routes
+@api_router.get("/usernames/check")
+async def check_username(username: str, current_user = Depends(get_current_user)):
+    username = username.strip()
+    if not username:
+        raise HTTPException(status_code=400, detail="Username is required")
+    
+    owner = await username_registry.owner(username)
+    return {'username': username, 'available': owner is None or owner == current_user['id']}
+
+@api_router.get("/usernames/search")
+async def search_usernames(prefix: str, limit: int = 10, current_user = Depends(get_current_user)):
+    prefix = prefix.strip()
+    if len(prefix) < 2:
+        raise HTTPException(status_code=400, detail="Prefix must be at least 2 characters")
+    
+    # Case-insensitive range scan on the username index; U+FFFF sorts after
+    # every character under the collation, closing the prefix range
+    limit = max(1, min(limit, USERNAME_SEARCH_LIMIT))
+    profiles = await db.profiles.find(
+        {'username': {'$gte': prefix, '$lt': prefix + '\uffff'}},
+        {'_id': 0, 'user_id': 1, 'username': 1, 'name': 1, 'photos': 1, 'photo_renditions': 1},
+        collation=USERNAME_COLLATION
+    ).sort('username', 1).limit(limit).to_list(limit)
+    
+    results = []
+    for profile in profiles:
+        use_photo_rendition(profile, 'thumb')
+        results.append({
+            'user_id': profile['user_id'],
+            'username': profile['username'],
+            'name': profile.get('name'),
+            'photo': (profile.get('photos') or [None])[0]
+        })
+    return results
+
+async def blocked_user_ids(user_id: str) -> set:
+    """Users I blocked plus users who blocked me."""
+    blocks = await db.blocked_users.find(
+        {'$or': [{'blocker_id': user_id}, {'blocked_id': user_id}]},
+        {'_id': 0, 'blocker_id': 1, 'blocked_id': 1}
+    ).to_list(None)
+    return {b['blocked_id'] if b['blocker_id'] == user_id else b['blocker_id'] for b in blocks}
+
+def distance_expression(latitude: float, longitude: float) -> dict:
+    """Great-circle distance in km from a point to the document's latitude/longitude."""
+    lat1, lon1 = math.radians(latitude), math.radians(longitude)
+    lat2, lon2 = {'$degreesToRadians': '$latitude'}, {'$degreesToRadians': '$longitude'}
+    cosine = {'$add': [
+        {'$multiply': [math.sin(lat1), {'$sin': lat2}]},
+        {'$multiply': [math.cos(lat1), {'$cos': lat2}, {'$cos': {'$subtract': [lon2, lon1]}}]}
+    ]}
+    # Rounding can push the cosine just past 1 for the same point
+    return {'$multiply': [6371, {'$acos': {'$min': [1, {'$max': [-1, cosine]}]}}]}
+
+@api_router.get("/search/profiles")
+async def search_profiles(
+    q: str,
+    position: Optional[str] = None,
+    tribe: Optional[str] = None,
+    min_age: Optional[int] = None,
+    max_age: Optional[int] = None,
+    max_distance: Optional[int] = None,
+    page: int = 1,
+    page_size: int = PROFILE_SEARCH_PAGE_SIZE,
+    current_user = Depends(get_current_user)
+):
+    q = q.strip()
+    if len(q) < 2:
+        raise HTTPException(status_code=400, detail="Search must be at least 2 characters")
+    
+    my_profile = await db.profiles.find_one(
+        {'user_id': current_user['id']},
+        {'_id': 0, 'latitude': 1, 'longitude': 1}
+    )
+    if not my_profile:
+        raise HTTPException(status_code=404, detail="Please create your profile first")
+    
+    # Text match and every filter run as one query on the profile_text index
+    excluded_ids = await blocked_user_ids(current_user['id']) | {current_user['id']}
+    match = {
+        '$text': {'$search': q},
+        'user_id': {'$nin': list(excluded_ids)},
+        'suspended': {'$ne': True}
+    }
+    if position:
+        match['position'] = position
+    if tribe:
+        match['tribe'] = tribe
+    if min_age is not None:
+        match.setdefault('age', {})['$gte'] = min_age
+    if max_age is not None:
+        match.setdefault('age', {})['$lte'] = max_age
+    
+    pipeline = [{'$match': match}]
+    has_location = my_profile.get('latitude') is not None and my_profile.get('longitude') is not None
+    if has_location:
+        distance_limit = max_distance if max_distance else (100 if current_user['is_pro'] else 25)
+        # Bounding box first so the distance is only computed for nearby matches
+        lat_delta = distance_limit / 111.0
+        lon_delta = distance_limit / (111.0 * max(math.cos(math.radians(my_profile['latitude'])), 0.01))
+        match['latitude'] = {'$gte': my_profile['latitude'] - lat_delta, '$lte': my_profile['latitude'] + lat_delta}
+        if lon_delta < 180:
+            match['longitude'] = {'$gte': my_profile['longitude'] - lon_delta, '$lte': my_profile['longitude'] + lon_delta}
+        pipeline += [
+            {'$addFields': {'distance': distance_expression(my_profile['latitude'], my_profile['longitude'])}},
+            {'$match': {'distance': {'$lte': distance_limit}}}
+        ]
+    
+    page = max(1, page)
+    page_size = max(1, min(page_size, PROFILE_SEARCH_MAX_PAGE_SIZE))
+    projection = {field: 1 for field in PROFILE_CARD_FIELDS}
+    projection.update({'_id': 0, 'distance': 1, 'score': {'$meta': 'textScore'}})
+    pipeline += [
+        {'$sort': {'score': {'$meta': 'textScore'}, 'user_id': 1}},
+        {'$skip': (page - 1) * page_size},
+        # One extra row tells us whether there is a next page
+        {'$limit': page_size + 1},
+        {'$project': projection}
+    ]
+    profiles = await db.profiles.aggregate(pipeline).to_list(page_size + 1)
+    
+    results = []
+    for profile in profiles[:page_size]:
+        use_photo_rendition(profile, 'card')
+        profile.pop('score', None)
+        if profile.get('distance') is not None:
+            profile['distance'] = round(profile['distance'], 1)
+        results.append(profile)
+    return {'results': results, 'page': page, 'has_more': len(profiles) > page_size}
+
 @api_router.get("/profile/{user_id}")
-async def get_profile(user_id: str, current_user = Depends(get_current_user)):
-    profile = await db.profiles.find_one({'user_id': user_id}, {'_id': 0})
-    if not profile:
+async def get_profile(user_id: str, request: Request, response: Response, current_user = Depends(get_current_user)):
+    # Conditional requests read just enough to build the ETag first
+    conditional = bool(request.headers.get('if-none-match'))
+    current = await db.profiles.find_one(
+        {'user_id': user_id},
+        {'_id': 0, 'version': 1, 'has_private_album': 1} if conditional else {'_id': 0}
+    )
+    if not current:
         raise HTTPException(status_code=404, detail="Profile not found")
     
-    # Track profile view for Pro users
-    if current_user['is_pro']:
-        await db.profile_views.insert_one({
-            'id': str(uuid.uuid4()),
-            'viewer_id': current_user['id'],
-            'viewed_id': user_id,
-            'timestamp': datetime.now(timezone.utc).isoformat()
-        })
+    # Track profile view for Pro users (buffered, never blocks the read)
+    if current_user['is_pro'] and user_id != current_user['id']:
+        profile_view_buffer.record(current_user['id'], user_id)
     
     # Check if viewer has access to private photos
     has_private_access = False
-    if profile.get('private_photos'):
-        access_grant = await db.private_album_access.find_one({
-            'requester_id': current_user['id'],
-            'owner_id': user_id,
-            'status': 'accepted'
-        })
-        has_private_access = access_grant is not None
+    if current.get('has_private_album'):
+        has_private_access = await album_grants.has_access(user_id, current_user['id'])
+    
+    # The representation depends on the version and on whether this viewer
+    # may see the private album
+    etag = make_etag('profile', user_id, current.get('version', 0), has_private_access,
+                     private_photo_window() if has_private_access else None)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
+    profile = current
+    if conditional:
+        profile = await db.profiles.find_one({'user_id': user_id}, {'_id': 0})
+        if not profile:
+            raise HTTPException(status_code=404, detail="Profile not found")
     
     # Remove private photos if no access
     if not has_private_access:
         profile['private_photos'] = []
+    else:
+        profile['private_photos'] = sign_private_photos(profile.get('private_photos') or [], current_user['id'])
     
+    set_etag(response, etag)
     return profile
 
 # Private Album Routes
@@ -425,18 +1436,37 @@ async def respond_to_private_album_request(response_data: PrivateAlbumResponse,
         {'$set': {'status': status, 'responded_at': datetime.now(timezone.utc).isoformat()}}
     )
     
-    # Grant access if accepted
+    # Grant access if accepted (one grant per owner/requester pair)
     if response_data.accepted:
-        await db.private_album_access.insert_one({
-            'id': str(uuid.uuid4()),
-            'requester_id': request['requester_id'],
-            'owner_id': current_user['id'],
-            'status': 'accepted',
-            'granted_at': datetime.now(timezone.utc).isoformat()
-        })
+        await db.private_album_access.update_one(
+            {'owner_id': current_user['id'], 'requester_id': request['requester_id']},
+            {
+                '$set': {'status': 'accepted', 'granted_at': datetime.now(timezone.utc).isoformat()},
+                '$setOnInsert': {'id': str(uuid.uuid4())}
+            },
+            upsert=True
+        )
+        await album_grants.invalidate(current_user['id'])
     
     return {'message': 'Response recorded'}
 
+@api_router.post("/private-album/revoke")
+async def revoke_private_album_access(revoke_data: PrivateAlbumRevoke, current_user = Depends(get_current_user)):
+    result = await db.private_album_access.delete_one({
+        'owner_id': current_user['id'],
+        'requester_id': revoke_data.requester_id
+    })
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Access grant not found")
+    
+    # Close the accepted request so the requester can ask again
+    await db.private_album_requests.update_many(
+        {'owner_id': current_user['id'], 'requester_id': revoke_data.requester_id, 'status': 'accepted'},
+        {'$set': {'status': 'revoked', 'revoked_at': datetime.now(timezone.utc).isoformat()}}
+    )
+    await album_grants.invalidate(current_user['id'])
+    return {'message': 'Access revoked'}
+
 @api_router.post("/log-screenshot-attempt")
 async def log_screenshot_attempt(attempt_data: ScreenshotAttempt, current_user = Depends(get_current_user)):
     log_id = str(uuid.uuid4())
@@ -500,6 +1530,7 @@ async def get_winks(current_user = Depends(get_current_user)):
         profile = await db.profiles.find_one({'user_id': wink['sender_id']}, {'_id': 0})
         if profile:
             profile['private_photos'] = []
+            use_photo_rendition(profile, 'thumb')
         wink['sender_profile'] = profile
     
     return winks
@@ -507,6 +1538,8 @@ async def get_winks(current_user = Depends(get_current_user)):
 # Discovery Routes
 @api_router.get("/discovery/profiles")
 async def get_discovery_profiles(
+    request: Request,
+    response: Response,
     position: Optional[str] = None,
     tribe: Optional[str] = None,
     looking_for: Optional[str] = None,
@@ -515,30 +1548,23 @@ async def get_discovery_profiles(
     available_now: Optional[bool] = None,
     max_distance: Optional[int] = None,
     online_only: Optional[bool] = None,
+    interests: Optional[str] = None,
+    limit: int = DISCOVERY_RESULT_LIMIT,
     current_user = Depends(get_current_user)
 ):
+    # daily_swipes is reset by the reset_daily_swipes job
     if not current_user['is_pro']:
-        last_reset = datetime.fromisoformat(current_user['last_swipe_reset'])
-        if datetime.now(timezone.utc) - last_reset > timedelta(days=1):
-            await db.users.update_one(
-                {'id': current_user['id']},
-                {'$set': {'daily_swipes': 0, 'last_swipe_reset': datetime.now(timezone.utc).isoformat()}}
-            )
-            current_user['daily_swipes'] = 0
-        
-        if current_user['daily_swipes'] >= 50:
+        if current_user.get('daily_swipes', 0) >= 50:
             raise HTTPException(status_code=403, detail="Daily swipe limit reached. Upgrade to Pro for unlimited swipes!")
     
     my_profile = await db.profiles.find_one({'user_id': current_user['id']}, {'_id': 0})
     if not my_profile:
         raise HTTPException(status_code=404, detail="Please create your profile first")
     
-    liked = await db.likes.find({'user_id': current_user['id']}, {'_id': 0}).to_list(1000)
-    passed = await db.passes.find({'user_id': current_user['id']}, {'_id': 0}).to_list(1000)
-    excluded_ids = [l['target_user_id'] for l in liked] + [p['target_user_id'] for p in passed] + [current_user['id']]
-    
-    filter_query = {'user_id': {'$nin': excluded_ids}}
+    excluded_ids = await swiped_user_ids(current_user['id']) | {current_user['id']}
     
+    # Normalized filter tuple shared by everyone in the same cell
+    filter_query = {}
     if position:
         filter_query['position'] = position
     if tribe:
@@ -553,38 +1579,111 @@ async def get_discovery_profiles(
         filter_query['age']['$lte'] = max_age
     if available_now:
         filter_query['available_now'] = True
-    
-    profiles = await db.profiles.find(filter_query, {'_id': 0}).to_list(200)
+    if interests:
+        # Comma separated; profiles must share every listed interest. The
+        # multikey index on interest_ids intersects the posting lists.
+        wanted = [i for i in interests.split(',') if i.strip()]
+        wanted_ids = await interest_tags.ids(wanted, create=False)
+        if len(wanted_ids) < len({normalize_interest(i) for i in wanted}):
+            # Nobody has an interest that was never interned
+            return []
+        filter_query['interest_ids'] = {'$all': sorted(wanted_ids)}
     
     default_max_distance = 100 if current_user['is_pro'] else 25
     distance_limit = max_distance if max_distance else default_max_distance
     
+    if my_profile.get('latitude') is None or my_profile.get('longitude') is None:
+        candidates = []
+    else:
+        candidates = await discovery_cache.candidates_for(
+            my_profile['latitude'], my_profile['longitude'], filter_query, distance_limit, excluded_ids
+        )
+    
+    # Exact distances on top of the shared list; full documents are only
+    # loaded for the profiles that make the cut, and not at all on a 304
     filtered_profiles = []
-    for profile in profiles:
+    for user_id, version, latitude, longitude, interests, is_available, hosting in candidates:
+        distance = calculate_distance(
+            my_profile['latitude'], my_profile['longitude'],
+            latitude, longitude
+        )
+        if distance <= distance_limit:
+            filtered_profiles.append({
+                'user_id': user_id,
+                'version': version,
+                'distance': round(distance, 1),
+                'interests': interests,
+                'available_now': is_available,
+                'hosting': hosting
+            })
+    candidate_ids = [p['user_id'] for p in filtered_profiles]
+    
+    # Ranking pulls in NumPy, so the first discovery request loads it rather
+    # than every worker at startup
+    from ranking import score_candidates, top_n, weights_from_env
+    rank_weights = weights_from_env()
+    
+    last_active = {}
+    if candidate_ids and (online_only or rank_weights['recency']):
+        users = await db.users.find(
+            {'id': {'$in': candidate_ids}, 'last_active': {'$exists': True}},
+            {'_id': 0, 'id': 1, 'last_active': 1}
+        ).to_list(None)
+        last_active = {u['id']: datetime.fromisoformat(u['last_active']).timestamp() for u in users}
+    
+    # Check online status if filter is active
+    if online_only:
+        # Consider online if active within last 5 minutes
+        active_since = (datetime.now(timezone.utc) - timedelta(minutes=5)).timestamp()
+        filtered_profiles = [p for p in filtered_profiles if last_active.get(p['user_id'], 0) >= active_since]
+    
+    # Likes from candidates turn my like into an instant match
+    liked_me = set()
+    if filtered_profiles and rank_weights['mutual']:
+        likes = await db.likes.find(
+            {'target_user_id': current_user['id'], 'user_id': {'$in': [p['user_id'] for p in filtered_profiles]}},
+            {'_id': 0, 'user_id': 1}
+        ).to_list(None)
+        liked_me = {l['user_id'] for l in likes}
+    
+    scores = score_candidates(
+        distances_km=[p['distance'] for p in filtered_profiles],
+        distance_limit=distance_limit,
+        my_interests=my_profile.get('interest_ids') or [],
+        candidate_interests=[p['interests'] for p in filtered_profiles],
+        last_active_ts=[last_active.get(p['user_id']) for p in filtered_profiles],
+        available_now=[p['available_now'] for p in filtered_profiles],
+        hosting=[p['hosting'] for p in filtered_profiles],
+        liked_me=[p['user_id'] in liked_me for p in filtered_profiles],
+        now_ts=time.time(),
+        weights=rank_weights
+    )
+    limit = max(1, min(limit, DISCOVERY_RESULT_LIMIT))
+    filtered_profiles = [filtered_profiles[i] for i in top_n(scores, limit)]
+    
+    etag = make_etag('discovery', [[p['user_id'], p.get('version', 0), p['distance']] for p in filtered_profiles])
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
+    full_profiles = await db.profiles.find(
+        {'user_id': {'$in': [p['user_id'] for p in filtered_profiles]}},
+        {'_id': 0}
+    ).to_list(None)
+    by_user_id = {p['user_id']: p for p in full_profiles}
+    
+    results = []
+    for candidate in filtered_profiles:
+        profile = by_user_id.get(candidate['user_id'])
+        if not profile:
+            continue
         # Remove private photos from discovery
         profile['private_photos'] = []
-        
-        # Check online status if filter is active
-        if online_only:
-            user = await db.users.find_one({'id': profile['user_id']}, {'_id': 0})
-            if user and user.get('last_active'):
-                last_active = datetime.fromisoformat(user['last_active'])
-                # Consider online if active within last 5 minutes
-                if datetime.now(timezone.utc) - last_active > timedelta(minutes=5):
-                    continue
-            else:
-                continue
-        
-        if my_profile.get('latitude') and profile.get('latitude'):
-            distance = calculate_distance(
-                my_profile['latitude'], my_profile['longitude'],
-                profile['latitude'], profile['longitude']
-            )
-            if distance <= distance_limit:
-                profile['distance'] = round(distance, 1)
-                filtered_profiles.append(profile)
+        use_photo_rendition(profile, 'card')
+        profile['distance'] = candidate['distance']
+        results.append(profile)
     
-    return filtered_profiles
+    set_etag(response, etag)
+    return results
 
 # Like/Pass Routes
 @api_router.post("/like")
@@ -595,11 +1694,7 @@ async def like_user(action: LikeAction, current_user = Depends(get_current_user)
             {'$inc': {'daily_swipes': 1}}
         )
     
-    existing = await db.likes.find_one({
-        'user_id': current_user['id'],
-        'target_user_id': action.target_user_id
-    })
-    if existing:
+    if await has_swiped('likes', current_user['id'], action.target_user_id):
         return {'message': 'Already liked', 'is_match': False}
     
     like_id = str(uuid.uuid4())
@@ -610,18 +1705,25 @@ async def like_user(action: LikeAction, current_user = Depends(get_current_user)
         'timestamp': datetime.now(timezone.utc).isoformat()
     })
     
-    mutual_like = await db.likes.find_one({
-        'user_id': action.target_user_id,
-        'target_user_id': current_user['id']
-    })
+    # Keep a running total on the target so the upsell badge never scans likes
+    await db.users.update_one(
+        {'id': action.target_user_id},
+        {'$inc': {'likes_received_count': 1}}
+    )
+    
+    mutual_like = await has_swiped('likes', action.target_user_id, current_user['id'])
     
     if mutual_like:
         match_id = str(uuid.uuid4())
+        matched_at = datetime.now(timezone.utc).isoformat()
         await db.matches.insert_one({
             'id': match_id,
             'user1_id': current_user['id'],
             'user2_id': action.target_user_id,
-            'matched_at': datetime.now(timezone.utc).isoformat()
+            'matched_at': matched_at,
+            'last_activity_at': matched_at,
+            'history_indexed': True,
+            'version': 1
         })
         return {'message': 'Match created!', 'is_match': True, 'match_id': match_id}
     
@@ -647,52 +1749,235 @@ async def pass_user(action: LikeAction, current_user = Depends(get_current_user)
 
 # Match Routes
 @api_router.get("/matches")
-async def get_matches(current_user = Depends(get_current_user)):
-    matches = await db.matches.find({
+async def get_matches(request: Request, response: Response, current_user = Depends(get_current_user)):
+    match_filter = {
         '$or': [
             {'user1_id': current_user['id']},
             {'user2_id': current_user['id']}
         ]
-    }, {'_id': 0}).to_list(1000)
+    }
+    
+    def other_user_ids(matches: List[dict]) -> List[str]:
+        return [m['user2_id'] if m['user1_id'] == current_user['id'] else m['user1_id'] for m in matches]
+    
+    def matches_etag(matches: List[dict], profiles: List[dict]) -> str:
+        # Sorted, so the tag does not depend on the order Mongo returns rows in
+        return make_etag(
+            'matches',
+            sorted([m['id'], m.get('version', 0)] for m in matches),
+            sorted([p['user_id'], p.get('version', 0)] for p in profiles)
+        )
     
-    for match in matches:
-        other_user_id = match['user2_id'] if match['user1_id'] == current_user['id'] else match['user1_id']
-        profile = await db.profiles.find_one({'user_id': other_user_id}, {'_id': 0})
+    # Conditional requests validate against the versions of every match and
+    # matched profile before reading anything else
+    if request.headers.get('if-none-match'):
+        versions = await db.matches.find(
+            match_filter,
+            {'_id': 0, 'id': 1, 'version': 1, 'user1_id': 1, 'user2_id': 1}
+        ).to_list(1000)
+        profile_versions = await db.profiles.find(
+            {'user_id': {'$in': other_user_ids(versions)}},
+            {'_id': 0, 'user_id': 1, 'version': 1}
+        ).to_list(None)
+        etag = matches_etag(versions, profile_versions)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+    
+    matches = await db.matches.find(match_filter, {'_id': 0}).to_list(1000)
+    profiles = await db.profiles.find(
+        {'user_id': {'$in': other_user_ids(matches)}},
+        {'_id': 0}
+    ).to_list(None)
+    etag = matches_etag(matches, profiles)
+    by_user_id = {p['user_id']: p for p in profiles}
+    
+    for match, other_user_id in zip(matches, other_user_ids(matches)):
+        profile = by_user_id.get(other_user_id)
         if profile:
             profile['private_photos'] = []
+            use_photo_rendition(profile, 'thumb')
         match['other_user'] = profile
     
+    set_etag(response, etag)
     return matches
 
+@api_router.get("/inbox")
+async def get_inbox(limit: int = 30, cursor: Optional[str] = None, current_user = Depends(get_current_user)):
+    limit = max(1, min(limit, 100))
+    my_id = current_user['id']
+    
+    # Keyset pagination on (last_activity_at, id), newest conversations
+    # first. One branch per side and cursor condition, so each is a range on
+    # a (userN_id, last_activity_at, id) index and the sort is a merge
+    keysets = [{}]
+    if cursor:
+        try:
+            cursor_at, cursor_id = cursor.rsplit('|', 1)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        keysets = [
+            {'last_activity_at': {'$lt': cursor_at}},
+            {'last_activity_at': cursor_at, 'id': {'$lt': cursor_id}}
+        ]
+    
+    pipeline = [
+        {'$match': {'$or': [{side: my_id, **keyset} for side in ('user1_id', 'user2_id') for keyset in keysets]}},
+        {'$sort': {'last_activity_at': -1, 'id': -1}},
+        {'$limit': limit},
+        {'$addFields': {
+            'other_user_id': {'$cond': [{'$eq': ['$user1_id', my_id]}, '$user2_id', '$user1_id']}
+        }},
+        {'$lookup': {
+            'from': 'profiles',
+            'localField': 'other_user_id',
+            'foreignField': 'user_id',
+            'as': 'other_user'
+        }},
+        {'$addFields': {'other_user': {'$arrayElemAt': ['$other_user', 0]}}},
+        {'$project': {
+            '_id': 0,
+            'id': 1,
+            'matched_at': 1,
+            'activity_at': '$last_activity_at',
+            'last_message': 1,
+            'unread_count': {'$max': [0, {'$subtract': [
+                {'$ifNull': ['$last_seq', 0]},
+                {'$ifNull': [f'$read_state.{my_id}.seq', 0]}
+            ]}]},
+            'other_user': {
+                'user_id': '$other_user.user_id',
+                'username': '$other_user.username',
+                'name': '$other_user.name',
+                'age': '$other_user.age',
+                'photos': {'$slice': [{'$ifNull': ['$other_user.photo_renditions.thumb', {'$ifNull': ['$other_user.photos', []]}]}, 1]},
+                'available_now': '$other_user.available_now'
+            }
+        }}
+    ]
+    
+    items = await db.matches.aggregate(pipeline).to_list(limit)
+    next_cursor = None
+    if len(items) == limit:
+        next_cursor = f"{items[-1]['activity_at']}|{items[-1]['id']}"
+    
+    return {'items': items, 'next_cursor': next_cursor}
+
 # Message Routes
 @api_router.post("/messages")
-async def send_message(message_data: MessageSend, current_user = Depends(get_current_user)):
-    match = await db.matches.find_one({'id': message_data.match_id}, {'_id': 0})
-    if not match:
-        raise HTTPException(status_code=404, detail="Match not found")
+async def send_message(message_data: MessageSend, request: Request, current_user = Depends(get_current_user)):
+    # Images arrive as camera-resolution data URIs: the bubble shows the card
+    # rendition and photo_url links to the full one
+    if message_data.message_type == 'image' and is_data_uri(message_data.content):
+        is_member = await db.matches.find_one({
+            'id': message_data.match_id,
+            '$or': [{'user1_id': current_user['id']}, {'user2_id': current_user['id']}]
+        }, {'_id': 1})
+        if not is_member:
+            raise HTTPException(status_code=403, detail="Not authorized")
+        photo = await store_photo(current_user['id'], message_data.content, public_base_url(request),
+                                  match_id=message_data.match_id)
+        message_data.content = photo['card']
+        message_data.photo_url = photo['full']
     
-    if current_user['id'] not in [match['user1_id'], match['user2_id']]:
+    message_id = str(uuid.uuid4())
+    sent_at = datetime.now(timezone.utc).isoformat()
+    
+    # Allocate the next per-match sequence number, move the sender's own read
+    # watermark past it and refresh the inbox preview in one atomic update
+    match = await db.matches.find_one_and_update(
+        {
+            'id': message_data.match_id,
+            '$or': [{'user1_id': current_user['id']}, {'user2_id': current_user['id']}]
+        },
+        [
+            {'$set': {
+                'last_seq': {'$add': [{'$ifNull': ['$last_seq', 0]}, 1]},
+                'version': {'$add': [{'$ifNull': ['$version', 0]}, 1]}
+            }},
+            {'$set': {'read_state': {'$mergeObjects': [
+                {'$ifNull': ['$read_state', {}]},
+                {current_user['id']: {'seq': '$last_seq', 'at': sent_at}}
+            ]}}},
+            {'$set': {
+                'last_message': {
+                    'id': message_id,
+                    'seq': '$last_seq',
+                    'sender_id': current_user['id'],
+                    'message_type': {'$literal': message_data.message_type},
+                    'snippet': {'$literal': message_data.content[:INBOX_SNIPPET_LENGTH]},
+                    'timestamp': sent_at
+                },
+                'last_activity_at': sent_at
+            }}
+        ],
+        projection={'_id': 0, 'last_seq': 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if not match:
+        exists = await db.matches.find_one({'id': message_data.match_id}, {'_id': 0, 'id': 1})
+        if not exists:
+            raise HTTPException(status_code=404, detail="Match not found")
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    message_id = str(uuid.uuid4())
     message = {
         'id': message_id,
         'match_id': message_data.match_id,
+        'seq': match['last_seq'],
         'sender_id': current_user['id'],
         'content': message_data.content,
         'message_type': message_data.message_type,
         'latitude': message_data.latitude,
         'longitude': message_data.longitude,
         'photo_url': message_data.photo_url,
-        'read': False,
-        'timestamp': datetime.now(timezone.utc).isoformat()
+        'timestamp': sent_at
     }
     
     await db.messages.insert_one(message)
+    if message_data.message_type == 'text':
+        moderation.submit({'collection': 'messages', 'id': message_id, 'match_id': message_data.match_id}, message_data.content)
     return {'message': 'Message sent', 'message_id': message_id}
 
+def apply_read_watermarks(messages: List[dict], match: dict):
+    """Derive read/read_at for each message from the recipient's watermark."""
+    read_state = match.get('read_state', {})
+    for msg in messages:
+        recipient_id = match['user2_id'] if msg['sender_id'] == match['user1_id'] else match['user1_id']
+        watermark = read_state.get(recipient_id)
+        if msg.get('seq', 0) > 0:
+            msg['read'] = bool(watermark) and watermark.get('seq', 0) >= msg['seq']
+            msg['read_at'] = watermark.get('at') if msg['read'] else None
+        elif watermark and not msg.get('read'):
+            # Messages from before watermarks existed count as read once the
+            # recipient has opened the conversation
+            msg['read'] = True
+            msg['read_at'] = watermark.get('at')
+    return messages
+
+async def index_message_history(match: dict):
+    """Give messages written before per-match sequences existed a seq.
+    
+    Legacy messages are numbered in timestamp order with values <= 0 so they
+    always sort before anything allocated by send_message and never collide
+    with it. Runs once per match; re-running assigns the same numbers.
+    """
+    legacy = await db.messages.find(
+        {'match_id': match['id'], 'seq': {'$exists': False}},
+        {'_id': 0, 'id': 1}
+    ).sort('timestamp', 1).to_list(None)
+    if legacy:
+        await db.messages.bulk_write([
+            UpdateOne({'id': msg['id']}, {'$set': {'seq': position - len(legacy)}})
+            for position, msg in enumerate(legacy, start=1)
+        ], ordered=False)
+    await db.matches.update_one({'id': match['id']}, {'$set': {'history_indexed': True}, '$inc': {'version': 1}})
+
 @api_router.get("/messages/{match_id}")
-async def get_messages(match_id: str, current_user = Depends(get_current_user)):
+async def get_messages(
+    match_id: str,
+    limit: int = MESSAGE_PAGE_SIZE,
+    before: Optional[int] = None,
+    current_user = Depends(get_current_user)
+):
     match = await db.matches.find_one({'id': match_id}, {'_id': 0})
     if not match:
         raise HTTPException(status_code=404, detail="Match not found")
@@ -700,16 +1985,49 @@ async def get_messages(match_id: str, current_user = Depends(get_current_user)):
     if current_user['id'] not in [match['user1_id'], match['user2_id']]:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    # Mark messages as read and add read_at timestamp for Pro users
-    other_user_id = match['user2_id'] if match['user1_id'] == current_user['id'] else match['user1_id']
-    read_at_time = datetime.now(timezone.utc).isoformat()
-    await db.messages.update_many(
-        {'match_id': match_id, 'sender_id': other_user_id, 'read': False},
-        {'$set': {'read': True, 'read_at': read_at_time}}
-    )
-    
-    messages = await db.messages.find({'match_id': match_id, 'deleted': {'$ne': True}}, {'_id': 0}).sort('timestamp', 1).to_list(1000)
-    return messages
+    # Advance my read watermark to the latest message - one small write on
+    # the match, and none at all when nothing new has arrived
+    last_seq = match.get('last_seq', 0)
+    my_state = match.setdefault('read_state', {}).get(current_user['id'], {})
+    if last_seq > my_state.get('seq', 0) or not my_state:
+        read_at_time = datetime.now(timezone.utc).isoformat()
+        await db.matches.update_one(
+            {'id': match_id},
+            {
+                '$max': {f"read_state.{current_user['id']}.seq": last_seq},
+                '$set': {f"read_state.{current_user['id']}.at": read_at_time},
+                '$inc': {'version': 1}
+            }
+        )
+        match['read_state'][current_user['id']] = {'seq': last_seq, 'at': read_at_time}
+    
+    if not match.get('history_indexed'):
+        await index_message_history(match)
+    
+    # Latest page first; older pages are fetched with before=<oldest seq>
+    limit = max(1, min(limit, 200))
+    message_filter = {
+        'match_id': match_id,
+        'deleted': {'$ne': True},
+        # Hidden by moderation: only the sender still sees it
+        '$or': [{'hidden': {'$ne': True}}, {'sender_id': current_user['id']}]
+    }
+    if before is not None:
+        message_filter['seq'] = {'$lt': before}
+    messages = await db.messages.find(message_filter, {'_id': 0}).sort('seq', -1).limit(limit).to_list(limit)
+    if len(messages) < limit and match.get('archived_through') is not None:
+        # Ran past the hot history of a match that has archived history:
+        # continue from the archive, older than anything already on this page
+        if messages:
+            message_filter['seq'] = {'$lt': messages[-1]['seq']}
+        archived = await db[archive_name('messages')].find(
+            message_filter,
+            {'_id': 0, 'archived_at': 0}
+        ).sort('seq', -1).limit(limit - len(messages)).to_list(limit - len(messages))
+        messages.extend(archived)
+    messages.reverse()
+    sign_message_photos(messages, current_user['id'])
+    return apply_read_watermarks(messages, match)
 
 # Delete message endpoint (Pro feature)
 @api_router.delete("/messages/{message_id}")
@@ -718,8 +2036,12 @@ async def delete_message(message_id: str, current_user = Depends(get_current_use
     if not current_user.get('is_pro'):
         raise HTTPException(status_code=403, detail="Pro subscription required to delete messages")
     
-    # Find the message
-    message = await db.messages.find_one({'id': message_id}, {'_id': 0})
+    # Find the message, which may already have been archived
+    collection = db.messages
+    message = await collection.find_one({'id': message_id}, {'_id': 0})
+    if not message:
+        collection = db[archive_name('messages')]
+        message = await collection.find_one({'id': message_id}, {'_id': 0})
     if not message:
         raise HTTPException(status_code=404, detail="Message not found")
     
@@ -728,21 +2050,82 @@ async def delete_message(message_id: str, current_user = Depends(get_current_use
         raise HTTPException(status_code=403, detail="You can only delete your own messages")
     
     # Soft delete the message (mark as deleted)
-    await db.messages.update_one(
+    await collection.update_one(
         {'id': message_id},
         {'$set': {'deleted': True, 'deleted_at': datetime.now(timezone.utc).isoformat()}}
     )
+    # An unsent last message also leaves the inbox preview
+    await db.matches.update_one(
+        {'id': message['match_id'], 'last_message.id': message_id},
+        {'$set': {'last_message.snippet': '', 'last_message.deleted': True}, '$inc': {'version': 1}}
+    )
+    if message.get('message_type') == 'image':
+        # An unsent image stops being served at once
+        await db.photo_renditions.delete_many({
+            'id': {'$in': own_photo_ids([message.get('content'), message.get('photo_url')])},
+            'match_id': message['match_id']
+        })
     
     return {'message': 'Message deleted successfully'}
 
+# Photo rendition serving (ids are unguessable, renditions never change;
+# private ones need a signed URL and are never cached publicly)
+@api_router.get("/photos/{photo_id}/{rendition}")
+async def get_photo_rendition(
+    photo_id: str,
+    rendition: str,
+    viewer: Optional[str] = None,
+    expires: Optional[int] = None,
+    sig: Optional[str] = None
+):
+    if rendition not in RENDITIONS:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    
+    photo = await db.photo_renditions.find_one(
+        {'id': photo_id},
+        {'_id': 0, 'user_id': 1, 'private': 1, 'match_id': 1, f'renditions.{rendition}': 1}
+    )
+    if not photo or rendition not in photo.get('renditions', {}):
+        raise HTTPException(status_code=404, detail="Photo not found")
+    
+    cache_control = 'public, max-age=31536000, immutable'
+    if photo.get('private'):
+        # Signed for one viewer, unexpired, and that viewer still has access:
+        # both sides of the match for a chat image, granted users for an album
+        valid = (
+            viewer and sig and expires and expires > time.time()
+            and hmac.compare_digest(sig, private_photo_signature(photo_id, viewer, expires))
+        )
+        if valid and photo.get('match_id'):
+            valid = await db.matches.find_one(
+                {'id': photo['match_id'], '$or': [{'user1_id': viewer}, {'user2_id': viewer}]},
+                {'_id': 1}
+            ) is not None
+        elif valid:
+            valid = viewer == photo['user_id'] or await album_grants.has_access(photo['user_id'], viewer)
+        if not valid:
+            raise HTTPException(status_code=404, detail="Photo not found")
+        cache_control = 'private, no-store'
+    
+    stored = photo['renditions'][rendition]
+    return Response(
+        content=bytes(stored['data']),
+        media_type=stored['content_type'],
+        headers={'Cache-Control': cache_control}
+    )
+
 # Uploaded Photos Routes
 @api_router.post("/uploaded-photos")
-async def save_uploaded_photo(photo_data: UploadedPhoto, current_user = Depends(get_current_user)):
+async def save_uploaded_photo(photo_data: UploadedPhoto, request: Request, current_user = Depends(get_current_user)):
+    photo_url = photo_data.photo_url
+    if is_data_uri(photo_url):
+        photo_url = (await store_photo(current_user['id'], photo_url, public_base_url(request)))['full']
+    
     photo_id = str(uuid.uuid4())
     photo = {
         'id': photo_id,
         'user_id': current_user['id'],
-        'photo_url': photo_data.photo_url,
+        'photo_url': photo_url,
         'uploaded_at': datetime.now(timezone.utc).isoformat()
     }
     
@@ -789,6 +2172,7 @@ async def send_public_message(message_data: PublicMessageSend, current_user = De
     }
     
     await db.public_messages.insert_one(message)
+    moderation.submit({'collection': 'public_messages', 'id': message_id}, message_data.content)
     return {'message': 'Message sent', 'message_id': message_id}
 
 @api_router.get("/public-chat/messages")
@@ -804,9 +2188,9 @@ async def get_public_messages(
     if not my_profile:
         raise HTTPException(status_code=404, detail="Profile not found")
     
-    time_cutoff = (datetime.now(timezone.utc) - timedelta(hours=24)).isoformat()
+    # Messages older than PUBLIC_CHAT_WINDOW are removed by expire_public_messages
     messages = await db.public_messages.find(
-        {'timestamp': {'$gte': time_cutoff}},
+        {'$or': [{'hidden': {'$ne': True}}, {'sender_id': current_user['id']}]},
         {'_id': 0}
     ).sort('timestamp', -1).to_list(500)
     
@@ -841,46 +2225,111 @@ async def get_public_messages(
 
 # Pro Features
 @api_router.get("/profile-views")
-async def get_profile_views(current_user = Depends(get_current_user)):
+async def get_profile_views(limit: int = 100, current_user = Depends(get_current_user)):
     if not current_user['is_pro']:
         raise HTTPException(status_code=403, detail="Pro feature only")
     
-    views = await db.profile_views.find({'viewed_id': current_user['id']}, {'_id': 0}).to_list(1000)
+    limit = max(1, min(limit, 200))
+    
+    # Collapse the daily rollups into one entry per viewer, most recent first
+    views = await db.profile_views.aggregate([
+        {'$match': {'viewed_id': current_user['id']}},
+        {'$group': {
+            '_id': '$viewer_id',
+            'id': {'$first': '$id'},
+            'view_count': {'$sum': {'$ifNull': ['$view_count', 1]}},
+            'timestamp': {'$max': '$timestamp'}
+        }},
+        {'$sort': {'timestamp': -1}},
+        {'$limit': limit},
+        {'$lookup': {
+            'from': 'profiles',
+            'localField': '_id',
+            'foreignField': 'user_id',
+            'as': 'viewer_profile'
+        }},
+        {'$addFields': {
+            'viewer_id': '$_id',
+            'viewed_id': current_user['id'],
+            'viewer_profile': {'$arrayElemAt': ['$viewer_profile', 0]}
+        }},
+        {'$project': {'_id': 0, 'viewer_profile._id': 0}}
+    ]).to_list(limit)
     
     for view in views:
-        profile = await db.profiles.find_one({'user_id': view['viewer_id']}, {'_id': 0})
-        if profile:
-            profile['private_photos'] = []
-        view['viewer_profile'] = profile
+        if view.get('viewer_profile'):
+            view['viewer_profile']['private_photos'] = []
+            use_photo_rendition(view['viewer_profile'], 'thumb')
+        else:
+            view['viewer_profile'] = None
     
     return views
 
 @api_router.get("/who-liked-me")
-async def get_who_liked_me(current_user = Depends(get_current_user)):
+async def get_who_liked_me(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    current_user = Depends(get_current_user)
+):
     if not current_user['is_pro']:
         raise HTTPException(status_code=403, detail="Pro feature only")
     
-    # Get all likes where current user is the target
-    likes = await db.likes.find({'target_user_id': current_user['id']}, {'_id': 0}).to_list(1000)
+    limit = max(1, min(limit, 100))
+    like_filter = {'target_user_id': current_user['id']}
+    if cursor:
+        # (timestamp, id) keyset so likes sharing a timestamp aren't skipped
+        try:
+            cursor_at, cursor_id = cursor.rsplit('|', 1)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        like_filter['$or'] = [
+            {'timestamp': {'$lt': cursor_at}},
+            {'timestamp': cursor_at, 'id': {'$lt': cursor_id}}
+        ]
+    
+    # Everyone I'm matched with, through the user1_id / user2_id indexes
+    matches = await db.matches.find(
+        {'$or': [{'user1_id': current_user['id']}, {'user2_id': current_user['id']}]},
+        {'_id': 0, 'user1_id': 1, 'user2_id': 1}
+    ).to_list(None)
+    matched_ids = [m['user2_id'] if m['user1_id'] == current_user['id'] else m['user1_id'] for m in matches]
+    
+    # Likes targeting me, newest first, hydrated with the liker's profile
+    # in a single round trip
+    likes = await db.likes.aggregate([
+        {'$match': like_filter},
+        {'$sort': {'timestamp': -1, 'id': -1}},
+        {'$limit': limit},
+        {'$lookup': {
+            'from': 'profiles',
+            'localField': 'user_id',
+            'foreignField': 'user_id',
+            'as': 'profile'
+        }},
+        {'$addFields': {
+            'already_matched': {'$in': ['$user_id', matched_ids]},
+            'profile': {'$arrayElemAt': ['$profile', 0]}
+        }},
+        {'$project': {'_id': 0, 'profile._id': 0}}
+    ]).to_list(limit)
     
-    # Check if already matched
     for like in likes:
-        # Check if mutual like exists (already matched)
-        mutual = await db.matches.find_one({
-            '$or': [
-                {'user1_id': current_user['id'], 'user2_id': like['user_id']},
-                {'user1_id': like['user_id'], 'user2_id': current_user['id']}
-            ]
-        })
-        like['already_matched'] = mutual is not None
-        
-        # Get profile
-        profile = await db.profiles.find_one({'user_id': like['user_id']}, {'_id': 0})
-        if profile:
-            profile['private_photos'] = []
-        like['profile'] = profile
+        if like.get('profile'):
+            like['profile']['private_photos'] = []
+            use_photo_rendition(like['profile'], 'card')
+        else:
+            like['profile'] = None
     
-    return likes
+    next_cursor = None
+    if len(likes) == limit:
+        next_cursor = f"{likes[-1]['timestamp']}|{likes[-1]['id']}"
+    
+    return {'items': likes, 'next_cursor': next_cursor}
+
+@api_router.get("/who-liked-me/count")
+async def get_who_liked_me_count(current_user = Depends(get_current_user)):
+    # Available to everyone - drives the Pro upsell badge
+    return {'count': current_user.get('likes_received_count', 0)}
 
 @api_router.get("/subscription/status")
 async def get_subscription_status(current_user = Depends(get_current_user)):
@@ -890,101 +2339,26 @@ async def get_subscription_status(current_user = Depends(get_current_user)):
         'subscription': subscription
     }
 
-@api_router.post("/subscription/checkout")
-async def create_checkout_session(checkout_req: CheckoutRequest, current_user = Depends(get_current_user)):
-    host_url = checkout_req.origin_url
-    webhook_url = f"{host_url}/api/webhook/stripe"
-    stripe_checkout = StripeCheckout(api_key=STRIPE_API_KEY, webhook_url=webhook_url)
-    
-    success_url = f"{host_url}/subscription/success?session_id={{{{CHECKOUT_SESSION_ID}}}}"
-    cancel_url = f"{host_url}/subscription/cancel"
-    
-    checkout_request = CheckoutSessionRequest(
-        amount=PRO_MONTHLY_PRICE,
-        currency="usd",
-        success_url=success_url,
-        cancel_url=cancel_url,
-        metadata={
-            'user_id': current_user['id'],
-            'product': 'pro_monthly'
-        }
-    )
-    
-    session = await stripe_checkout.create_checkout_session(checkout_request)
-    
-    await db.payment_transactions.insert_one({
-        'id': str(uuid.uuid4()),
-        'user_id': current_user['id'],
-        'session_id': session.session_id,
-        'amount': PRO_MONTHLY_PRICE,
-        'currency': 'usd',
-        'payment_status': 'pending',
-        'metadata': {'product': 'pro_monthly'},
-        'created_at': datetime.now(timezone.utc).isoformat()
-    })
-    
-    return {'url': session.url, 'session_id': session.session_id}
-
-@api_router.get("/subscription/checkout/status/{session_id}")
-async def get_checkout_status(session_id: str, current_user = Depends(get_current_user)):
-    transaction = await db.payment_transactions.find_one({'session_id': session_id}, {'_id': 0})
-    if not transaction:
-        raise HTTPException(status_code=404, detail="Transaction not found")
-    
-    if transaction['payment_status'] == 'paid':
-        return {'status': 'complete', 'payment_status': 'paid'}
-    
-    webhook_url = "placeholder"
-    stripe_checkout = StripeCheckout(api_key=STRIPE_API_KEY, webhook_url=webhook_url)
-    status = await stripe_checkout.get_checkout_status(session_id)
-    
-    if status.payment_status == 'paid' and transaction['payment_status'] != 'paid':
-        await db.payment_transactions.update_one(
-            {'session_id': session_id},
-            {'$set': {'payment_status': 'paid', 'updated_at': datetime.now(timezone.utc).isoformat()}}
-        )
-        
-        await db.users.update_one(
-            {'id': transaction['user_id']},
-            {'$set': {'is_pro': True}}
-        )
-        
-        await db.subscriptions.insert_one({
-            'id': str(uuid.uuid4()),
-            'user_id': transaction['user_id'],
-            'status': 'active',
-            'started_at': datetime.now(timezone.utc).isoformat()
-        })
-    
-    return status.model_dump()
-
-@api_router.post("/webhook/stripe")
-async def stripe_webhook(request: Request, stripe_signature: str = Header(None)):
-    body = await request.body()
-    
-    webhook_url = "placeholder"
-    stripe_checkout = StripeCheckout(api_key=STRIPE_API_KEY, webhook_url=webhook_url)
-    
-    try:
-        webhook_response = await stripe_checkout.handle_webhook(body, stripe_signature)
-        
-        if webhook_response.payment_status == 'paid':
-            transaction = await db.payment_transactions.find_one({'session_id': webhook_response.session_id}, {'_id': 0})
-            if transaction and transaction['payment_status'] != 'paid':
-                await db.payment_transactions.update_one(
-                    {'session_id': webhook_response.session_id},
-                    {'$set': {'payment_status': 'paid'}}
-                )
-                
-                await db.users.update_one(
-                    {'id': transaction['user_id']},
-                    {'$set': {'is_pro': True}}
-                )
-        
-        return {'status': 'success'}
-    except Exception as e:
-        logger.error(f"Webhook error: {e}")
-        raise HTTPException(status_code=400, detail=str(e))
+# Health
+@api_router.get("/health")
+async def health_check():
+    started = time.perf_counter()
+    await db.command('ping')
+    ping_ms = (time.perf_counter() - started) * 1000
+    pool_options = client.options.pool_options
+    return {
+        'status': 'ok',
+        'mongo': {
+            'ping_ms': round(ping_ms, 3),
+            'max_pool_size': pool_options.max_pool_size,
+            'min_pool_size': pool_options.min_pool_size,
+            'pool': mongo_pool_stats.snapshot()
+        },
+        'discovery_cache': discovery_cache.snapshot(),
+        'rate_limits': rate_limiter.snapshot(),
+        'moderation': moderation.snapshot(),
+        'jobs': scheduler.snapshot()
+    }
 
 # Block user endpoint
 @api_router.post("/block-user")
@@ -1095,6 +2469,7 @@ async def get_admin_stats(current_user = Depends(get_current_user)):
     pending_reports = await db.user_reports.count_documents({'status': 'pending'})
     total_blocks = await db.blocked_users.count_documents({})
     pro_users = await db.users.count_documents({'is_pro': True})
+    moderation = await db.counters.find_one({'_id': 'moderation'}, {'_id': 0}) or {}
     
     return {
         'total_users': total_users,
@@ -1103,7 +2478,8 @@ async def get_admin_stats(current_user = Depends(get_current_user)):
         'total_reports': total_reports,
         'pending_reports': pending_reports,
         'total_blocks': total_blocks,
-        'pro_users': pro_users
+        'pro_users': pro_users,
+        'moderation': moderation
     }
 
 @api_router.post("/admin/report/{report_id}/resolve")
@@ -1120,6 +2496,148 @@ async def resolve_report(report_id: str, data: dict, current_user = Depends(get_
     
     return {'message': f'Report marked as {action}'}
 
+REPORT_ACTIONS = {'reviewed', 'dismissed', 'actioned'}
+REPORT_BATCH_LIMIT = 500
+
+@api_router.post("/admin/reports/resolve-batch")
+async def resolve_reports_batch(batch: ReportBatchResolve, current_user = Depends(get_admin_user)):
+    if not batch.items:
+        raise HTTPException(status_code=400, detail="No reports to resolve")
+    if len(batch.items) > REPORT_BATCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"At most {REPORT_BATCH_LIMIT} reports per batch")
+    
+    now = datetime.now(timezone.utc).isoformat()
+    reports = await db.user_reports.find(
+        {'id': {'$in': [item.report_id for item in batch.items]}},
+        {'_id': 0, 'id': 1, 'reporter_id': 1, 'reported_id': 1}
+    ).to_list(None)
+    reports_by_id = {r['id']: r for r in reports}
+    
+    # One write list per collection; `owners` maps each report write back to
+    # its item so bulk errors can be reported per item
+    outcomes = []
+    report_ops, owners = [], []
+    block_ops, block_owners = [], {}
+    suspended_ids, suspend_owners = set(), {}
+    seen = set()
+    for item in batch.items:
+        outcome = {'report_id': item.report_id, 'action': item.action, 'blocked': False, 'suspended': False}
+        outcomes.append(outcome)
+        report = reports_by_id.get(item.report_id)
+        if item.report_id in seen:
+            outcome['status'] = 'duplicate'
+            continue
+        seen.add(item.report_id)
+        if not report:
+            outcome['status'] = 'not_found'
+            continue
+        if item.action not in REPORT_ACTIONS:
+            outcome['status'] = 'invalid_action'
+            continue
+        
+        outcome['status'] = 'resolved'
+        report_ops.append(UpdateOne(
+            {'id': item.report_id},
+            {'$set': {'status': item.action, 'reviewed_at': now, 'reviewed_by': current_user['id']}}
+        ))
+        owners.append(outcome)
+        
+        pair = (report['reporter_id'], report['reported_id'])
+        if item.block:
+            if pair not in block_owners:
+                block_ops.append(UpdateOne(
+                    {'blocker_id': pair[0], 'blocked_id': pair[1]},
+                    {'$setOnInsert': {'id': str(uuid.uuid4()), 'timestamp': now, 'source': 'moderation'}},
+                    upsert=True
+                ))
+            block_owners.setdefault(pair, []).append(outcome)
+            outcome['blocked'] = True
+        if item.suspend:
+            suspended_ids.add(report['reported_id'])
+            suspend_owners.setdefault(report['reported_id'], []).append(outcome)
+            outcome['suspended'] = True
+    
+    async def run_bulk(collection, operations):
+        if not operations:
+            return None
+        try:
+            await collection.bulk_write(operations, ordered=False)
+            return None
+        except BulkWriteError as e:
+            return e.details.get('writeErrors', [])
+    
+    suspended_list = sorted(suspended_ids)
+    report_errors, block_errors, user_errors, profile_errors = await asyncio.gather(
+        run_bulk(db.user_reports, report_ops),
+        run_bulk(db.blocked_users, block_ops),
+        run_bulk(db.users, [
+            UpdateOne({'id': user_id}, {'$set': {'is_suspended': True, 'suspended_at': now, 'suspended_by': current_user['id']}})
+            for user_id in suspended_list
+        ]),
+        run_bulk(db.profiles, [
+            UpdateOne({'user_id': user_id}, {'$set': {'suspended': True}, '$inc': {'version': 1}})
+            for user_id in suspended_list
+        ])
+    )
+    for error in report_errors or []:
+        owners[error['index']]['status'] = 'failed'
+    # Both suspension writes use suspended_list order; a user whose account or
+    # profile write failed fails every item that asked for the suspension
+    failed_suspensions = {suspended_list[error['index']] for error in (user_errors or []) + (profile_errors or [])}
+    for user_id in failed_suspensions:
+        for outcome in suspend_owners[user_id]:
+            outcome['status'] = 'failed'
+            outcome['suspended'] = False
+    suspended_list = [user_id for user_id in suspended_list if user_id not in failed_suspensions]
+    if suspended_ids:
+        # Suspended profiles leave the shared discovery decks right away
+        located = await db.profiles.find(
+            {'user_id': {'$in': sorted(suspended_ids)}},
+            {'_id': 0, 'latitude': 1, 'longitude': 1}
+        ).to_list(None)
+        await discovery_cache.invalidate(*[(p.get('latitude'), p.get('longitude')) for p in located])
+    # Block writes follow the order pairs were first seen in; a failed block
+    # fails every item that asked for it
+    block_pairs = list(block_owners)
+    failed_blocks = {block_pairs[error['index']] for error in block_errors or []}
+    for pair in failed_blocks:
+        for outcome in block_owners[pair]:
+            outcome['status'] = 'failed'
+            outcome['blocked'] = False
+    if block_errors:
+        logger.error(f"Moderation blocks failed: {block_errors}")
+    blocked = len(block_ops) - len(failed_blocks)
+    
+    resolved = [o for o in outcomes if o['status'] == 'resolved']
+    counters = {f"reports_{action}": sum(1 for o in resolved if o['action'] == action) for action in REPORT_ACTIONS}
+    counters = {k: v for k, v in counters.items() if v}
+    counters['blocks'] = blocked
+    counters['suspensions'] = len(suspended_list)
+    await db.counters.update_one({'_id': 'moderation'}, {'$inc': counters}, upsert=True)
+    
+    return {
+        'resolved': len(resolved),
+        'blocked': blocked,
+        'suspended': len(suspended_list),
+        'items': outcomes
+    }
+
+@api_router.get("/admin/moderation/flagged")
+async def get_flagged_messages(current_user = Depends(get_admin_user)):
+    flagged = {}
+    for collection in ('messages', 'public_messages'):
+        flagged[collection] = await db[collection].find(
+            {'moderation.screened_at': {'$exists': True}},
+            {'_id': 0}
+        ).sort('moderation.screened_at', -1).to_list(MODERATION_FLAGGED_LIMIT)
+    return flagged
+
+@api_router.post("/admin/moderation/reload")
+async def reload_moderation_terms(current_user = Depends(get_admin_user)):
+    # Every worker rebuilds its matcher from MODERATION_TERMS_FILE
+    await moderation.reload()
+    return {'message': 'Moderation terms reloading', 'terms': len(moderation.terms)}
+
 @api_router.get("/admin/users")
 async def get_all_users(current_user = Depends(get_current_user)):
     users = await db.users.find({}, {'_id': 0, 'password_hash': 0}).to_list(1000)
@@ -1131,15 +2649,24 @@ async def get_all_users(current_user = Depends(get_current_user)):
     
     return users
 
-app.include_router(api_router)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+def create_app() -> FastAPI:
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(api_router)
+    
+    # Payments live in their own module and import the Stripe integration on
+    # first use, so workers that never take a payment never load it
+    from payments import router as payments_router
+    app.include_router(payments_router)
+    
+    app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    return app
 
 logging.basicConfig(
     level=logging.INFO,
@@ -1147,6 +2674,118 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+async def create_album_grant_index():
+    keys = [('owner_id', 1), ('requester_id', 1)]
+    try:
+        await db.private_album_access.create_index(keys, unique=True)
+    except OperationFailure:
+        # Older responses could insert the same grant twice; keep the first
+        duplicates = await db.private_album_access.aggregate([
+            {'$sort': {'granted_at': 1}},
+            {'$group': {
+                '_id': {'owner_id': '$owner_id', 'requester_id': '$requester_id'},
+                'ids': {'$push': '$_id'},
+                'count': {'$sum': 1}
+            }},
+            {'$match': {'count': {'$gt': 1}}}
+        ]).to_list(None)
+        extra_ids = [doc_id for group in duplicates for doc_id in group['ids'][1:]]
+        if extra_ids:
+            await db.private_album_access.delete_many({'_id': {'$in': extra_ids}})
+            logger.info(f"Removed {len(extra_ids)} duplicate private album grants")
+        await db.private_album_access.create_index(keys, unique=True)
+
+async def backfill_match_activity():
+    # The inbox sorts on the stored last_activity_at; matches from before it
+    # existed (and still without a message) get their match time
+    result = await db.matches.update_many(
+        {'last_activity_at': {'$exists': False}},
+        [{'$set': {'last_activity_at': '$matched_at'}}]
+    )
+    if result.modified_count:
+        logger.info(f"Backfilled last_activity_at on {result.modified_count} matches")
+
+async def create_indexes():
+    await db.profiles.create_index('user_id')
+    try:
+        await db.profiles.create_index('username', unique=True, collation=USERNAME_COLLATION)
+    except OperationFailure as e:
+        # Existing case-insensitive duplicates have to be renamed first
+        logger.error(f"Could not build the unique username index: {e}")
+    await db.profiles.create_index([('latitude', 1), ('longitude', 1)])
+    await db.profiles.create_index('interest_ids')
+    await db.profiles.create_index([('available_now', 1), ('available_now_at', 1)])
+    await db.profiles.create_index(
+        [(field, 'text') for field in PROFILE_TEXT_WEIGHTS],
+        weights=PROFILE_TEXT_WEIGHTS,
+        name='profile_text',
+        # Profiles have no per-document language; keep Mongo from reading one
+        language_override='text_language'
+    )
+    await db.blocked_users.create_index('blocker_id')
+    await db.blocked_users.create_index('blocked_id')
+    await db.users.create_index('id')
+    await db.users.create_index('last_swipe_reset')
+    await db.account_deletions.create_index('id', unique=True)
+    await db.account_deletions.create_index('user_id', unique=True)
+    await db.account_deletions.create_index('status')
+    # Cascade lookups that no hot endpoint needs an index for
+    await db.passes.create_index('target_user_id')
+    await db.winks.create_index('sender_id')
+    await db.winks.create_index('receiver_id')
+    await db.screenshot_attempts.create_index('viewer_id')
+    await db.screenshot_attempts.create_index('owner_id')
+    await db.public_messages.create_index('sender_id')
+    await db.user_reports.create_index('reporter_id')
+    await db.private_album_requests.create_index('requester_id')
+    await db.private_album_requests.create_index('owner_id')
+    await db.private_album_access.create_index('requester_id')
+    await db.uploaded_photos.create_index('user_id')
+    await db.photo_renditions.create_index('user_id')
+    await db.public_messages.create_index([('timestamp', -1)])
+    # Only screened-and-matched messages carry a moderation field
+    await db.messages.create_index([('moderation.screened_at', -1)], sparse=True)
+    await db.public_messages.create_index([('moderation.screened_at', -1)], sparse=True)
+    await db.interest_tags.create_index('name', unique=True)
+    await db.interest_tags.create_index('id', unique=True)
+    await create_album_grant_index()
+    await db.likes.create_index([('target_user_id', 1), ('timestamp', -1), ('id', -1)])
+    await db.likes.create_index([('user_id', 1), ('target_user_id', 1)])
+    await db.matches.create_index([('user1_id', 1), ('user2_id', 1)])
+    await db.matches.create_index([('user2_id', 1), ('user1_id', 1)])
+    await db.matches.create_index([('user1_id', 1), ('last_activity_at', -1), ('id', -1)])
+    await db.matches.create_index([('user2_id', 1), ('last_activity_at', -1), ('id', -1)])
+    await db.messages.create_index(
+        [('match_id', 1), ('seq', -1)],
+        unique=True,
+        partialFilterExpression={'seq': {'$exists': True}}
+    )
+    # Archival scans (see archive_messages / archive_swipes)
+    await db.messages.create_index('timestamp')
+    await db.messages.create_index('deleted', partialFilterExpression={'deleted': True})
+    await db.likes.create_index('timestamp')
+    await db.passes.create_index('timestamp')
+    for collection in ('messages', 'likes', 'passes'):
+        await ensure_archive_collection(db, collection)
+    await db[archive_name('messages')].create_index([('match_id', 1), ('seq', -1)])
+    await db[archive_name('messages')].create_index('id')
+    await db[archive_name('likes')].create_index('user_id')
+    await db[archive_name('passes')].create_index('user_id')
+    await db.swipe_history.create_index('user_id', unique=True)
+    await db.profile_views.create_index(
+        [('viewer_id', 1), ('viewed_id', 1), ('day', 1)],
+        unique=True,
+        partialFilterExpression={'day': {'$exists': True}}
+    )
+    await db.profile_views.create_index([('viewed_id', 1), ('timestamp', -1)])
+    await db.photo_renditions.create_index('id', unique=True)
+    await db.stripe_webhook_events.create_index('event_id', unique=True)
+    await db.stripe_webhook_events.create_index([('status', 1), ('received_at', 1)])
+    await db.stripe_webhook_events.create_index('claimed_by', sparse=True)
+    await db.subscriptions.create_index(
+        'session_id',
+        unique=True,
+        partialFilterExpression={'session_id': {'$exists': True}}
+    )
+
+app = create_app()
@@ -0,0 +1,126 @@
+"""Username availability.
+
+Usernames are unique regardless of case, enforced by a unique index on
+``profiles.username`` with a strength-2 collation; every username query
+passes the same collation so it can use that index.
+
+Each worker also keeps a bloom filter of every taken username (case
+folded). A negative answer from the filter means the name is definitely
+free and needs no query; a positive answer may be a false positive and is
+confirmed against the index. New names are broadcast over the shared
+cache so every worker's filter learns about them. The unique index stays
+the source of truth for writes.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+from typing import Optional
+
+from pymongo.collation import Collation
+
+logger = logging.getLogger(__name__)
+
+USERNAME_COLLATION = Collation(locale='en', strength=2)
+USERNAME_CHANNEL = 'usernames:taken'
+BLOOM_ERROR_RATE = 0.01
+BLOOM_MIN_CAPACITY = 10_000
+
+
+def username_key(username: str) -> str:
+    return username.strip().casefold()
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = BLOOM_ERROR_RATE):
+        self.capacity = max(capacity, 1)
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: str):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, value: str):
+        for position in self._positions(value):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value: str) -> bool:
+        return all(self._bits[p >> 3] & (1 << (p & 7)) for p in self._positions(value))
+
+
+class UsernameRegistry:
+    """Per-worker bloom filter of taken usernames, rebuilt when it fills up."""
+
+    def __init__(self, get_db, cache):
+        self._get_db = get_db
+        self._cache = cache
+        self._filter: Optional[BloomFilter] = None
+        self._loader: Optional[asyncio.Task] = None
+        self.filter_skips = 0
+        self.index_lookups = 0
+
+    @property
+    def db(self):
+        return self._get_db()
+
+    def start(self):
+        self._loader = asyncio.create_task(self._start())
+
+    async def stop(self):
+        if self._loader is not None:
+            self._loader.cancel()
+            try:
+                await self._loader
+            except asyncio.CancelledError:
+                pass
+            self._loader = None
+
+    async def _start(self):
+        await self._cache.subscribe(USERNAME_CHANNEL, self._on_taken)
+        await self._rebuild()
+
+    async def _rebuild(self):
+        try:
+            count = await self.db.profiles.estimated_document_count()
+            bloom = BloomFilter(max(BLOOM_MIN_CAPACITY, count * 2))
+            cursor = self.db.profiles.find({}, {'_id': 0, 'username': 1}).batch_size(5000)
+            async for profile in cursor:
+                if profile.get('username'):
+                    bloom.add(username_key(profile['username']))
+            self._filter = bloom
+            logger.info(f"Username filter loaded with {bloom.count} names")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Username filter load failed: {e}")
+
+    async def _on_taken(self, username: str):
+        if self._filter is None:
+            return
+        self._filter.add(username_key(username))
+        if self._filter.count > self._filter.capacity and (self._loader is None or self._loader.done()):
+            self._loader = asyncio.create_task(self._rebuild())
+
+    async def taken(self, username: str):
+        """Tell every worker (this one included) that a username is in use."""
+        await self._cache.publish(USERNAME_CHANNEL, username)
+
+    async def owner(self, username: str) -> Optional[str]:
+        """user_id holding the username (any case), or None if it is free."""
+        if self._filter is not None and username_key(username) not in self._filter:
+            self.filter_skips += 1
+            return None
+        self.index_lookups += 1
+        profile = await self.db.profiles.find_one(
+            {'username': username.strip()},
+            {'_id': 0, 'user_id': 1},
+            collation=USERNAME_COLLATION
+        )
+        return profile['user_id'] if profile else None
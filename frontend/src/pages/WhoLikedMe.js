@@ -11,18 +11,27 @@ const WhoLikedMe = () => {
   const navigate = useNavigate();
   const [likes, setLikes] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
   const [selectedProfile, setSelectedProfile] = useState(null);
 
   useEffect(() => {
     fetchLikes();
   }, []);
 
-  const fetchLikes = async () => {
+  // Likes are paged newest first; "Load more" passes next_cursor to append
+  const fetchLikes = async (cursor = null) => {
+    if (cursor) setLoadingMore(true);
     try {
       const response = await axios.get(`${API}/who-liked-me`, {
-        headers: { Authorization: `Bearer ${token}` }
+        headers: { Authorization: `Bearer ${token}` },
+        params: cursor ? { cursor } : {}
       });
-      setLikes(response.data);
+      const items = response.data.items || [];
+      setLikes(prev => cursor
+        ? [...prev, ...items.filter(item => !prev.some(l => l.id === item.id))]
+        : items);
+      setNextCursor(response.data.next_cursor || null);
     } catch (error) {
       if (error.response?.status === 403) {
         toast.error('This is a Pro feature!');
@@ -32,6 +41,7 @@ const WhoLikedMe = () => {
       }
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -131,6 +141,19 @@ const WhoLikedMe = () => {
             ))}
           </div>
         )}
+
+        {!loading && nextCursor && (
+          <div className="text-center mt-6">
+            <button
+              onClick={() => fetchLikes(nextCursor)}
+              disabled={loadingMore}
+              className="btn-primary px-6 py-2"
+              data-testid="load-more-likes"
+            >
+              {loadingMore ? 'Loading...' : 'Load more'}
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );
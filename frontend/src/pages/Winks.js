@@ -89,7 +89,7 @@ const Winks = () => {
       const response = await axios.get(`${API}/who-liked-me`, {
         headers: { Authorization: `Bearer ${token}` }
       });
-      setLikes(response.data);
+      setLikes(response.data.items);
     } catch (error) {
       toast.error('Failed to load likes');
     } finally {
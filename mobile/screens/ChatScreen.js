@@ -7,10 +7,15 @@ import api from '../config/api';
 import { useAuth } from '../context/AuthContext';
 import { COLORS, FONT_SIZES, SPACING } from '../config/constants';
 
+const MESSAGE_PAGE_SIZE = 50;
+
 const ChatScreen = ({ route, navigation }) => {
   const { matchId, matchName } = route.params;
   const { profile } = useAuth();
+  // Oldest first by seq; the inverted list below renders it newest first
   const [messages, setMessages] = useState([]);
+  const [hasOlder, setHasOlder] = useState(true);
+  const [loadingOlder, setLoadingOlder] = useState(false);
   const [newMessage, setNewMessage] = useState('');
   const [showAttachMenu, setShowAttachMenu] = useState(false);
   const [sendingLocation, setSendingLocation] = useState(false);
@@ -35,15 +40,49 @@ const ChatScreen = ({ route, navigation }) => {
     }
   };
 
+  // Merge the latest page into what is loaded: it replaces everything from
+  // its oldest seq on (picking up reads and unsends). If a full page doesn't
+  // reach back to what we have, too much arrived in between to stitch the
+  // two together, so start over from the latest page and page back again.
+  const mergeLatest = (current, latest) => {
+    if (latest.length === 0) return current;
+    const oldestSeq = latest[0].seq;
+    const newest = current[current.length - 1];
+    if (newest && latest.length >= MESSAGE_PAGE_SIZE && oldestSeq > newest.seq) {
+      setHasOlder(true);
+      return latest;
+    }
+    return [...current.filter(m => m.seq < oldestSeq), ...latest];
+  };
+
   const fetchMessages = async () => {
     try {
-      const response = await api.get(`/messages/${matchId}`);
-      setMessages(response.data);
+      const response = await api.get(`/messages/${matchId}`, { params: { limit: MESSAGE_PAGE_SIZE } });
+      setMessages(prev => mergeLatest(prev, response.data));
     } catch (error) {
       console.error('Error fetching messages:', error);
     }
   };
 
+  const fetchOlderMessages = async () => {
+    const oldest = messages[0];
+    if (!hasOlder || loadingOlder || oldest?.seq === undefined) return;
+
+    setLoadingOlder(true);
+    try {
+      const response = await api.get(`/messages/${matchId}`, { params: { before: oldest.seq, limit: MESSAGE_PAGE_SIZE } });
+      if (response.data.length === 0) {
+        setHasOlder(false);
+      } else {
+        setMessages(prev => [...response.data.filter(m => m.seq < prev[0].seq), ...prev]);
+      }
+    } catch (error) {
+      console.error('Error fetching older messages:', error);
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
   const sendMessage = async (content, messageType = 'text') => {
     if (!content.trim()) return;
 
@@ -348,10 +387,12 @@ const ChatScreen = ({ route, navigation }) => {
       </View>
 
       <FlatList
-        data={messages}
+        data={[...messages].reverse()}
         renderItem={renderMessage}
         keyExtractor={(item) => item.id}
         contentContainerStyle={styles.messagesList}
+        onEndReached={fetchOlderMessages}
+        onEndReachedThreshold={0.2}
         inverted
       />
 
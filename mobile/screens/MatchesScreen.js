@@ -22,19 +22,29 @@ const MatchesScreen = ({ navigation }) => {
   const [favorites, setFavorites] = useState([]);
   const [searchQuery, setSearchQuery] = useState('');
   const [loading, setLoading] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
 
   useEffect(() => {
     fetchConversations();
   }, []);
 
-  const fetchConversations = async () => {
+  useEffect(() => {
+    // Filter favorites
+    setFavorites(conversations.filter(c => c.is_favorite));
+  }, [conversations]);
+
+  // The inbox is paged: the first call loads the most recent conversations,
+  // later calls pass next_cursor to append older ones
+  const fetchConversations = async (cursor = null) => {
+    if (loading) return;
     setLoading(true);
     try {
-      const response = await api.get('/matches');
-      setConversations(response.data || []);
-      // Filter favorites
-      const favs = (response.data || []).filter(c => c.is_favorite);
-      setFavorites(favs);
+      const response = await api.get('/inbox', { params: cursor ? { cursor } : {} });
+      const items = response.data?.items || [];
+      setConversations(prev => cursor
+        ? [...prev, ...items.filter(item => !prev.some(c => c.id === item.id))]
+        : items);
+      setNextCursor(response.data?.next_cursor || null);
     } catch (error) {
       console.log('Error fetching conversations:', error);
     } finally {
@@ -42,12 +52,18 @@ const MatchesScreen = ({ navigation }) => {
     }
   };
 
+  const loadMoreConversations = () => {
+    if (nextCursor && !loading) {
+      fetchConversations(nextCursor);
+    }
+  };
+
   const getDisplayData = () => {
     const data = activeTab === 'all' ? conversations : favorites;
     if (searchQuery) {
       return data.filter(c => 
-        c.name?.toLowerCase().includes(searchQuery.toLowerCase()) ||
-        c.username?.toLowerCase().includes(searchQuery.toLowerCase())
+        c.other_user?.name?.toLowerCase().includes(searchQuery.toLowerCase()) ||
+        c.other_user?.username?.toLowerCase().includes(searchQuery.toLowerCase())
       );
     }
     return data;
@@ -56,16 +72,16 @@ const MatchesScreen = ({ navigation }) => {
   const renderConversationItem = ({ item }) => (
     <TouchableOpacity 
       style={styles.conversationItem}
-      onPress={() => navigation.navigate('Chat', { matchId: item.id, user: item })}
+      onPress={() => navigation.navigate('Chat', { matchId: item.id, matchName: item.other_user?.name, user: item.other_user })}
     >
       <Image 
-        source={{ uri: item.photos?.[0] || 'https://via.placeholder.com/60' }} 
+        source={{ uri: item.other_user?.photos?.[0] || 'https://via.placeholder.com/60' }} 
         style={styles.avatar} 
       />
       <View style={styles.conversationInfo}>
-        <Text style={styles.conversationName}>{item.name}</Text>
+        <Text style={styles.conversationName}>{item.other_user?.name}</Text>
         <Text style={styles.lastMessage} numberOfLines={1}>
-          {item.last_message || 'Start a conversation!'}
+          {item.last_message?.snippet || 'Start a conversation!'}
         </Text>
       </View>
       {item.unread_count > 0 && (
@@ -161,6 +177,8 @@ const MatchesScreen = ({ navigation }) => {
             keyExtractor={(item) => item.id || item._id}
             renderItem={renderConversationItem}
             showsVerticalScrollIndicator={false}
+            onEndReached={loadMoreConversations}
+            onEndReachedThreshold={0.5}
           />
         ) : (
           renderEmptyState()
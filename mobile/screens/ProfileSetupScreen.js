@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect } from 'react';
 import {
   View,
   Text,
@@ -22,6 +22,7 @@ import { COLORS, FONT_SIZES, SPACING, MAX_PHOTOS } from '../config/constants';
 const ProfileSetupScreen = () => {
   const { fetchUserProfile, logout } = useAuth();
   const [username, setUsername] = useState('');
+  const [usernameStatus, setUsernameStatus] = useState(null); // checking | available | taken
   const [name, setName] = useState('');
   const [age, setAge] = useState('');
   const [bio, setBio] = useState('');
@@ -48,6 +49,24 @@ const ProfileSetupScreen = () => {
   const [showEthnicityPicker, setShowEthnicityPicker] = useState(false);
   const [showRelationshipPicker, setShowRelationshipPicker] = useState(false);
 
+  useEffect(() => {
+    const candidate = username.trim();
+    if (!candidate) {
+      setUsernameStatus(null);
+      return;
+    }
+    setUsernameStatus('checking');
+    const timer = setTimeout(async () => {
+      try {
+        const response = await api.get('/usernames/check', { params: { username: candidate } });
+        setUsernameStatus(response.data.available ? 'available' : 'taken');
+      } catch (error) {
+        setUsernameStatus(null);
+      }
+    }, 400);
+    return () => clearTimeout(timer);
+  }, [username]);
+
   // Options
   const ages = Array.from({ length: 82 }, (_, i) => (i + 18).toString());
   
@@ -336,6 +355,8 @@ const ProfileSetupScreen = () => {
             <Text style={styles.label}>Username *</Text>
             <TextInput style={styles.input} placeholder="Choose a username" placeholderTextColor="#999"
               value={username} onChangeText={setUsername} autoCapitalize="none" />
+            {usernameStatus === 'available' && <Text style={styles.usernameAvailable}>Username is available</Text>}
+            {usernameStatus === 'taken' && <Text style={styles.usernameTaken}>Username already taken</Text>}
           </View>
 
           <View style={styles.inputContainer}>
@@ -485,6 +506,8 @@ const styles = StyleSheet.create({
   label: { fontSize: FONT_SIZES.medium, color: '#333', marginBottom: SPACING.xs, fontWeight: '600' },
   input: { backgroundColor: '#F5F5F5', borderRadius: 12, padding: SPACING.md, fontSize: FONT_SIZES.medium, color: '#333', borderWidth: 1, borderColor: '#E0E0E0' },
   bioInput: { height: 100, textAlignVertical: 'top' },
+  usernameAvailable: { fontSize: FONT_SIZES.small, color: '#4CAF50', marginTop: SPACING.xs },
+  usernameTaken: { fontSize: FONT_SIZES.small, color: '#FF6B6B', marginTop: SPACING.xs },
   pickerButton: { flexDirection: 'row', justifyContent: 'space-between', alignItems: 'center', backgroundColor: '#F5F5F5', borderRadius: 12, padding: SPACING.md, borderWidth: 1, borderColor: '#E0E0E0' },
   pickerButtonText: { fontSize: FONT_SIZES.medium, color: '#333' },
   placeholderText: { color: '#999' },
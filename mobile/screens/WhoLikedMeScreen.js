@@ -7,25 +7,41 @@ import { COLORS, FONT_SIZES, SPACING } from '../config/constants';
 const WhoLikedMeScreen = ({ navigation }) => {
   const [likes, setLikes] = useState([]);
   const [refreshing, setRefreshing] = useState(false);
+  const [loading, setLoading] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
 
   useEffect(() => {
     fetchLikes();
   }, []);
 
-  const fetchLikes = async () => {
+  // Likes are paged newest first; later calls pass next_cursor to append
+  const fetchLikes = async (cursor = null) => {
+    if (loading) return;
+    setLoading(true);
     try {
-      const response = await api.get('/who-liked-me');
-      setLikes(response.data);
+      const response = await api.get('/who-liked-me', { params: cursor ? { cursor } : {} });
+      const items = response.data?.items || [];
+      setLikes(prev => cursor
+        ? [...prev, ...items.filter(item => !prev.some(l => l.id === item.id))]
+        : items);
+      setNextCursor(response.data?.next_cursor || null);
     } catch (error) {
       if (error.response?.status === 403) {
         Alert.alert('Pro Feature', 'Upgrade to Pro to see who liked you!');
         navigation.goBack();
       }
     } finally {
+      setLoading(false);
       setRefreshing(false);
     }
   };
 
+  const loadMoreLikes = () => {
+    if (nextCursor && !loading) {
+      fetchLikes(nextCursor);
+    }
+  };
+
   const renderLike = ({ item }) => (
     <View style={styles.likeCard}>
       <Image
@@ -58,8 +74,10 @@ const WhoLikedMeScreen = ({ navigation }) => {
         renderItem={renderLike}
         keyExtractor={(item) => item.id}
         contentContainerStyle={styles.list}
+        onEndReached={loadMoreLikes}
+        onEndReachedThreshold={0.5}
         refreshControl={
-          <RefreshControl refreshing={refreshing} onRefresh={fetchLikes} tintColor={COLORS.primary} />
+          <RefreshControl refreshing={refreshing} onRefresh={() => fetchLikes()} tintColor={COLORS.primary} />
         }
       />
     </View>
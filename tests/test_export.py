@@ -0,0 +1,84 @@
+import asyncio
+import base64
+import io
+import json
+import zipfile
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import export
+from export import SECTION_NOTES, SECTIONS, stream_ndjson, stream_zip
+
+
+@pytest.fixture
+def db():
+    db = AsyncMongoMockClient()['export_test']
+
+    async def seed():
+        await db.users.insert_one({'id': 'u1', 'email': 'u1@example.com', 'password': 'hash'})
+        await db.profiles.insert_one({'user_id': 'u1', 'name': 'U1', 'photo_renditions': [{'full': 'x'}]})
+        await db.matches.insert_one({'id': 'm1', 'user1_id': 'u1', 'user2_id': 'u2', 'read_state': {}})
+        await db.messages.insert_many([
+            {'id': f'msg{i}', 'match_id': 'm1', 'sender_id': 'u1' if i % 2 else 'u2', 'content': f'hi {i}'}
+            for i in range(10)
+        ])
+        await db.messages_archive.insert_one(
+            {'id': 'old', 'match_id': 'm1', 'sender_id': 'u1', 'content': 'old', 'archived_at': 't'}
+        )
+        await db.likes.insert_one({'id': 'l1', 'user_id': 'u1', 'target_user_id': 'u2'})
+        await db.photo_renditions.insert_one({
+            'id': 'p1', 'user_id': 'u1', 'created_at': 't',
+            'renditions': {'full': {'content_type': 'image/jpeg', 'data': b'\xff\xd8jpeg'}}
+        })
+
+    asyncio.run(seed())
+    return db
+
+
+async def collect(stream):
+    return b''.join([chunk async for chunk in stream])
+
+
+def test_stream_ndjson(db, monkeypatch):
+    monkeypatch.setattr(export, 'EXPORT_CHUNK_BYTES', 64)
+    lines = [json.loads(line) for line in asyncio.run(collect(stream_ndjson(db, 'u1', list(SECTIONS)))).splitlines()]
+
+    complete = {line['section']: line for line in lines if line.get('complete')}
+    assert list(complete) == list(SECTIONS)
+    assert {name: line['count'] for name, line in complete.items()} == {
+        'account': 1, 'profile': 1, 'matches': 1, 'messages': 6,
+        'likes': 1, 'uploaded_photos': 0, 'photos': 1
+    }
+    assert complete['messages']['note'] == SECTION_NOTES['messages']
+
+    data = [line for line in lines if 'data' in line]
+    account = next(line['data'] for line in data if line['section'] == 'account')
+    assert 'password' not in account
+    messages = [line['data'] for line in data if line['section'] == 'messages']
+    assert {m['sender_id'] for m in messages} == {'u1'}
+    assert all('archived_at' not in m for m in messages)
+    photo = next(line['data'] for line in data if line['section'] == 'photos')
+    assert base64.b64decode(photo['data']) == b'\xff\xd8jpeg'
+
+
+def test_stream_zip(db, monkeypatch):
+    monkeypatch.setattr(export, 'EXPORT_CHUNK_BYTES', 64)
+    archive = zipfile.ZipFile(io.BytesIO(asyncio.run(collect(stream_zip(db, 'u1', ['profile', 'messages', 'photos'])))))
+
+    assert archive.testzip() is None
+    assert sorted(archive.namelist()) == ['manifest.json', 'messages.ndjson', 'photos/p1.jpeg', 'profile.ndjson']
+    manifest = json.loads(archive.read('manifest.json'))
+    assert manifest['user_id'] == 'u1'
+    assert manifest['sections'] == {'profile': 1, 'messages': 6, 'photos': 1}
+    assert manifest['notes'] == {'messages': SECTION_NOTES['messages']}
+    profile = json.loads(archive.read('profile.ndjson'))
+    assert 'photo_renditions' not in profile
+    assert len(archive.read('messages.ndjson').splitlines()) == 6
+    assert archive.read('photos/p1.jpeg') == b'\xff\xd8jpeg'
+
+
+def test_stream_zip_of_a_subset(db):
+    archive = zipfile.ZipFile(io.BytesIO(asyncio.run(collect(stream_zip(db, 'u1', ['likes'])))))
+    assert sorted(archive.namelist()) == ['likes.ndjson', 'manifest.json']
+    assert json.loads(archive.read('manifest.json'))['notes'] == {}
@@ -0,0 +1,69 @@
+import base64
+import io
+
+import pytest
+from PIL import Image
+
+from images import RENDITIONS, InvalidImage, decode_data_uri, is_data_uri, render
+
+
+def data_uri(image: Image.Image, image_format: str = 'JPEG', **save_args) -> str:
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **save_args)
+    return f"data:image/{image_format.lower()};base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+@pytest.mark.parametrize('image_format', ['JPEG', 'WEBP'])
+def test_render_fits_every_rendition_in_its_box(image_format):
+    renditions = render(data_uri(Image.new('RGB', (2000, 1000), 'red')), image_format)
+
+    assert set(renditions) == set(RENDITIONS)
+    for name, max_edge in RENDITIONS.items():
+        rendition = renditions[name]
+        assert (rendition['width'], rendition['height']) == (max_edge, max_edge // 2)
+        assert rendition['content_type'] == f'image/{image_format.lower()}'
+        with Image.open(io.BytesIO(rendition['data'])) as decoded:
+            assert decoded.format == image_format
+            assert decoded.size == (max_edge, max_edge // 2)
+
+
+def test_render_never_upscales():
+    renditions = render(data_uri(Image.new('RGB', (300, 200))), 'JPEG')
+    assert (renditions['thumb']['width'], renditions['thumb']['height']) == (160, 107)
+    assert (renditions['card']['width'], renditions['card']['height']) == (300, 200)
+    assert (renditions['full']['width'], renditions['full']['height']) == (300, 200)
+
+
+def test_render_applies_orientation_and_drops_exif():
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotated 90 degrees
+    exif[0x010F] = 'Camera maker'
+    renditions = render(data_uri(Image.new('RGB', (400, 200)), exif=exif), 'JPEG')
+
+    assert (renditions['full']['width'], renditions['full']['height']) == (200, 400)
+    with Image.open(io.BytesIO(renditions['full']['data'])) as decoded:
+        assert not decoded.getexif()
+
+
+def test_render_converts_transparency():
+    renditions = render(data_uri(Image.new('RGBA', (100, 100)), 'PNG'), 'JPEG')
+    assert renditions['thumb']['content_type'] == 'image/jpeg'
+
+
+def test_render_rejects_unsupported_formats():
+    with pytest.raises(InvalidImage, match='Unsupported image format'):
+        render(data_uri(Image.new('RGB', (10, 10)), 'GIF'), 'JPEG')
+
+
+def test_render_rejects_undecodable_data():
+    with pytest.raises(InvalidImage):
+        render('data:image/jpeg;base64,' + base64.b64encode(b'not an image').decode(), 'JPEG')
+
+
+def test_decode_data_uri_requires_base64():
+    assert is_data_uri('data:image/png;base64,AAAA')
+    assert not is_data_uri('https://example.com/photo.jpg')
+    with pytest.raises(InvalidImage):
+        decode_data_uri('data:image/png,raw')
+    with pytest.raises(InvalidImage):
+        decode_data_uri('data:image/png;base64,***')
@@ -0,0 +1,51 @@
+from pathlib import Path
+
+from moderation import Automaton, load_terms, normalize_text
+
+
+def test_finds_whole_words_only():
+    automaton = Automaton(['spam', 'send money'])
+    assert automaton.find('this is spam') == ['spam']
+    assert automaton.find('spammer here') == []
+    assert automaton.find('please SEND   money now') == ['send money']
+
+
+def test_folds_character_substitutions():
+    automaton = Automaton(['bitcoin', 'cash'])
+    assert automaton.find('b1tc0in please') == ['bitcoin']
+    assert automaton.find('all ca$h') == ['cash']
+    assert automaton.find('B!TCOIN') == ['bitcoin']
+
+
+def test_punctuation_that_folds_still_ends_a_word():
+    assert Automaton(['send money']).find('send money!') == ['send money']
+    assert Automaton(['bitcoin']).find('Bitcoin!!') == ['bitcoin']
+    assert Automaton(['bitcoin']).find('buy bitcoin!') == ['bitcoin']
+    assert Automaton(['bitcoin']).find('$bitcoin$') == ['bitcoin']
+
+
+def test_reports_each_term_once_in_order():
+    automaton = Automaton(['scam', 'wire', 'wire transfer'])
+    assert automaton.find('scam: wire transfer, wire, scam') == ['scam', 'wire', 'wire transfer']
+
+
+def test_overlapping_terms():
+    automaton = Automaton(['he', 'she', 'hers'])
+    assert sorted(automaton.find('she hers he')) == ['he', 'hers', 'she']
+
+
+def test_empty_automaton_and_text():
+    assert Automaton([]).find('anything') == []
+    assert Automaton(['spam']).find('') == []
+    assert Automaton(['spam']).find('   ') == []
+
+
+def test_normalize_text():
+    assert normalize_text('  H3LL0   W0rld ') == 'hello world'
+
+
+def test_load_terms(tmp_path: Path):
+    path = tmp_path / 'terms.txt'
+    path.write_text('# comment\nspam\nScam|hide\nscam|flag\nodd|delete\n\n', encoding='utf-8')
+    assert load_terms(path) == {'spam': 'flag', 'scam': 'hide', 'odd': 'flag'}
+    assert load_terms(tmp_path / 'missing.txt') == {}
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from ranking import DEFAULT_WEIGHTS, interest_overlap, score_candidates, top_n, unseen_candidates, weights_from_env
+
+NOW = 1_700_000_000.0
+
+
+def score(weights, **overrides):
+    args = dict(
+        distances_km=[0.0, 10.0, 20.0],
+        distance_limit=20.0,
+        my_interests=[],
+        candidate_interests=[[], [], []],
+        last_active_ts=[None, None, None],
+        available_now=[False, False, False],
+        hosting=[None, None, None],
+        liked_me=[False, False, False],
+        now_ts=NOW,
+        weights=weights,
+    )
+    args.update(overrides)
+    return score_candidates(**args)
+
+
+def test_distance_signal_falls_off_to_the_limit():
+    np.testing.assert_allclose(score({'distance': 1.0}), [1.0, 0.5, 0.0])
+
+
+def test_interest_overlap_is_jaccard():
+    overlap = interest_overlap([1, 2, 2, 3], [[1, 2, 3], [3, 4], [], [5]])
+    np.testing.assert_allclose(overlap, [1.0, 0.25, 0.0, 0.0])
+    assert not interest_overlap([], [[1]]).any()
+    assert len(interest_overlap([1], [])) == 0
+
+
+def test_recency_halves_every_half_life_and_never_active_scores_zero():
+    scores = score({'recency': 1.0}, last_active_ts=[NOW, NOW - 24 * 3600, None])
+    np.testing.assert_allclose(scores, [1.0, 0.5, 0.0])
+
+
+def test_boolean_and_hosting_signals():
+    scores = score(
+        {'available': 1.0, 'hosting': 10.0, 'mutual': 100.0},
+        available_now=[True, False, False],
+        hosting=['Can Host', 'Can Travel', 'Unknown'],
+        liked_me=[False, False, True],
+    )
+    np.testing.assert_allclose(scores, [11.0, 5.0, 100.0])
+
+
+def test_weights_combine_signals():
+    scores = score({'distance': 2.0, 'interests': 1.0}, my_interests=[1], candidate_interests=[[], [1], [1]])
+    np.testing.assert_allclose(scores, [2.0, 2.0, 1.0])
+    assert not score({}).any()
+
+
+def test_top_n_orders_best_first_and_keeps_ties_stable():
+    scores = np.array([0.5, 2.0, 0.5, 1.0, 2.0])
+    assert top_n(scores, 3) == [1, 4, 3]
+    assert top_n(scores, 10) == [1, 4, 3, 0, 2]
+    assert top_n(scores, 0) == []
+    assert top_n(np.array([]), 5) == []
+
+
+def test_weights_from_env(monkeypatch):
+    monkeypatch.setenv('RANK_WEIGHT_MUTUAL', '0')
+    weights = weights_from_env()
+    assert weights['mutual'] == 0.0
+    assert weights['distance'] == pytest.approx(DEFAULT_WEIGHTS['distance'])
+
+
+def rows(*user_ids):
+    return [[user_id, 0, 40.0, -74.0, [], False, None] for user_id in user_ids]
+
+
+def test_unseen_candidates_drops_excluded():
+    remaining, refill = unseen_candidates(rows('a', 'b', 'c'), {'b'}, pool_limit=10, refill_below=2)
+    assert [c[0] for c in remaining] == ['a', 'c']
+    assert not refill
+
+
+def test_unseen_candidates_refills_a_full_list_used_up_by_exclusions():
+    remaining, refill = unseen_candidates(rows('a', 'b', 'c'), {'a', 'b'}, pool_limit=3, refill_below=2)
+    assert [c[0] for c in remaining] == ['c']
+    assert refill
+
+
+def test_unseen_candidates_never_refills_a_list_that_was_not_cut_off():
+    remaining, refill = unseen_candidates(rows('a', 'b'), {'a', 'b'}, pool_limit=3, refill_below=2)
+    assert remaining == []
+    assert not refill
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+import cache
+from cache import MemoryCache
+from ratelimit import RateLimiter, Rule
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, 'monotonic', clock)
+    return clock
+
+
+def test_take_token_spends_the_burst_then_refills(clock):
+    store = MemoryCache()
+
+    async def run():
+        taken = [await store.take_token('bucket', rate=1.0, capacity=3) for _ in range(4)]
+        assert [allowed for allowed, _ in taken] == [True, True, True, False]
+        assert taken[-1][1] == pytest.approx(1.0)
+        clock.now += 1.0
+        assert (await store.take_token('bucket', rate=1.0, capacity=3))[0]
+        assert not (await store.take_token('bucket', rate=1.0, capacity=3))[0]
+
+    asyncio.run(run())
+
+
+def test_take_token_buckets_are_independent(clock):
+    store = MemoryCache()
+
+    async def run():
+        assert (await store.take_token('a', rate=1.0, capacity=1))[0]
+        assert not (await store.take_token('a', rate=1.0, capacity=1))[0]
+        assert (await store.take_token('b', rate=1.0, capacity=1))[0]
+
+    asyncio.run(run())
+
+
+def scope(path='/api/search/profiles', user='u1', ip='10.0.0.1'):
+    headers = [(b'authorization', f'Bearer {user}'.encode())] if user else []
+    return {'type': 'http', 'method': 'GET', 'path': path, 'headers': headers, 'client': (ip, 1234)}
+
+
+def identify(headers):
+    auth = headers.get('authorization', '')
+    return auth[len('Bearer '):] or None
+
+
+def limiter(limits):
+    return RateLimiter([Rule('GET /api/search/profiles', limits)], MemoryCache(), identify)
+
+
+def test_check_ignores_routes_without_a_rule(clock):
+    rule, retry_after = asyncio.run(limiter({'ip': '1/60'}).check(scope(path='/api/other')))
+    assert rule is None and retry_after == 0.0
+
+
+def test_check_limits_per_user(clock):
+    rate_limiter = limiter({'user': '2/60', 'ip': '100/60'})
+
+    async def run():
+        assert (await rate_limiter.check(scope()))[0] is None
+        assert (await rate_limiter.check(scope()))[0] is None
+        rule, retry_after = await rate_limiter.check(scope())
+        assert rule is not None and retry_after == pytest.approx(30.0)
+        # Another user behind the same IP is unaffected
+        assert (await rate_limiter.check(scope(user='u2')))[0] is None
+
+    asyncio.run(run())
+
+
+def test_denied_user_does_not_spend_the_shared_ip_bucket(clock):
+    rate_limiter = limiter({'user': '1/60', 'ip': '3/60'})
+
+    async def run():
+        assert (await rate_limiter.check(scope()))[0] is None
+        for _ in range(5):
+            assert (await rate_limiter.check(scope()))[0] is not None
+        # u1 took one IP token; the other two are still there
+        assert (await rate_limiter.check(scope(user='u2')))[0] is None
+        assert (await rate_limiter.check(scope(user='u3')))[0] is None
+        assert (await rate_limiter.check(scope(user='u4')))[0] is not None
+
+    asyncio.run(run())
+    assert rate_limiter.rules[0].limited == 6
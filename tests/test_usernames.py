@@ -0,0 +1,37 @@
+from usernames import BloomFilter, username_key
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000)
+    names = [f'user{i}' for i in range(1000)]
+    for name in names:
+        bloom.add(name)
+    assert all(name in bloom for name in names)
+    assert bloom.count == 1000
+
+
+def test_bloom_filter_false_positive_rate_is_near_the_target():
+    bloom = BloomFilter(5000, error_rate=0.01)
+    for i in range(5000):
+        bloom.add(f'taken{i}')
+    false_positives = sum(f'free{i}' in bloom for i in range(20000))
+    assert false_positives / 20000 < 0.02
+
+
+def test_bloom_filter_sizing():
+    bloom = BloomFilter(10_000, error_rate=0.01)
+    # ~9.6 bits and ~7 hashes per element at 1%
+    assert 95_000 <= bloom.size <= 96_000
+    assert bloom.hashes == 7
+    assert len(bloom._bits) == (bloom.size + 7) // 8
+    assert BloomFilter(0).capacity == 1
+
+
+def test_empty_bloom_filter_contains_nothing():
+    assert 'anyone' not in BloomFilter(100)
+
+
+def test_username_key():
+    assert username_key('  Spark_Mate ') == 'spark_mate'
+    # Case folding matches the strength-2 collation, which treats ß as ss
+    assert username_key('Straße') == username_key('STRASSE')